@@ -1,37 +1,132 @@
 import os
 import logging
 import secrets
+import sqlite3
+import tempfile
 
-from flask import Flask
+from flask import Flask, Request
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging: LOG_LEVEL for the application, REQUEST_LOG_LEVEL for
+# the per-request timing lines (see instrumentation.py)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 
 class Base(DeclarativeBase):
     pass
 
 
 db = SQLAlchemy(model_class=Base)
+
+
+class SpoolingRequest(Request):
+    """
+    Request that keeps uploaded files in memory only up to
+    UPLOAD_SPOOL_THRESHOLD bytes and spools anything larger to disk
+    """
+
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(
+            max_size=app.config["UPLOAD_SPOOL_THRESHOLD"], mode="rb+")
+
+
 # create the app
 app = Flask(__name__)
+app.request_class = SpoolingRequest
 # Use environment variable or generate strong random key
 app.secret_key = os.environ.get("SESSION_SECRET", secrets.token_hex(16))
 
 # Initialize CSRF protection
 csrf = CSRFProtect(app)
 
-# Configure the SQLite database
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///llm_assessment.db"
+# Configure the database: DATABASE_URL selects the backend, defaulting to a
+# local SQLite file
+database_url = os.environ.get("DATABASE_URL", "sqlite:///llm_assessment.db")
+# Plain postgres:// and postgresql:// URLs use the psycopg2 driver the
+# project depends on
+for scheme in ("postgres://", "postgresql://"):
+    if database_url.startswith(scheme):
+        database_url = "postgresql+psycopg2://" + database_url[len(scheme):]
+app.config["SQLALCHEMY_DATABASE_URI"] = database_url
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+
+if database_url.startswith("sqlite"):
+    # Pragmas applied to every new SQLite connection (see set_sqlite_pragmas)
+    app.config["SQLITE_BUSY_TIMEOUT"] = int(
+        os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))  # milliseconds
+    app.config["SQLITE_MMAP_SIZE"] = int(
+        os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+else:
+    # Pooled connections for Postgres (psycopg2)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Use write-ahead logging on SQLite so readers do not block behind a
+    writer (and the other way round), wait for locks instead of failing with
+    "database is locked", and memory-map the database file
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT']:d}")
+    cursor.execute(f"PRAGMA mmap_size={app.config['SQLITE_MMAP_SIZE']:d}")
+    cursor.close()
+
+# Uploads larger than this many bytes are spooled to a temporary file
+app.config["UPLOAD_SPOOL_THRESHOLD"] = int(
+    os.environ.get("UPLOAD_SPOOL_THRESHOLD", 1024 * 1024))
+# Bulk ingestion settings: rows parsed per pandas chunk, and rows inserted
+# between commits (defaults to one commit per chunk)
+app.config["INGEST_CHUNK_SIZE"] = int(os.environ.get("INGEST_CHUNK_SIZE", 5000))
+app.config["INGEST_COMMIT_ROWS"] = int(
+    os.environ.get("INGEST_COMMIT_ROWS", app.config["INGEST_CHUNK_SIZE"]))
+# Number of rows fetched per batch while streaming exports
+app.config["EXPORT_BATCH_SIZE"] = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+# Default and maximum page sizes of the /responses/<file_id> endpoint
+app.config["RESPONSES_PAGE_SIZE"] = int(os.environ.get("RESPONSES_PAGE_SIZE", 1000))
+app.config["RESPONSES_MAX_PAGE_SIZE"] = int(
+    os.environ.get("RESPONSES_MAX_PAGE_SIZE", 10000))
+# Maximum number of assessments accepted in one batch submission
+app.config["ASSESSMENT_BATCH_MAX"] = int(os.environ.get("ASSESSMENT_BATCH_MAX", 500))
+# Number of assessments the browser queues before submitting them
+app.config["ASSESSMENT_QUEUE_SIZE"] = int(os.environ.get("ASSESSMENT_QUEUE_SIZE", 10))
+# Number of upcoming responses the assessment page prefetches
+app.config["ASSESSMENT_PREFETCH_SIZE"] = int(os.environ.get("ASSESSMENT_PREFETCH_SIZE", 5))
+# Number of search results shown per page
+app.config["SEARCH_PAGE_SIZE"] = int(os.environ.get("SEARCH_PAGE_SIZE", 50))
+# Number of locations listed by the location statistics endpoint
+app.config["LOCATION_STATS_LIMIT"] = int(os.environ.get("LOCATION_STATS_LIMIT", 100))
+# Number of groups ranked by the leaderboard
+app.config["LEADERBOARD_LIMIT"] = int(os.environ.get("LEADERBOARD_LIMIT", 500))
+# Files with more responses than this are deleted by a background job
+app.config["DELETE_JOB_THRESHOLD"] = int(os.environ.get("DELETE_JOB_THRESHOLD", 10000))
+# Per-request instrumentation: level of the timing lines, and the number of
+# SQL statements above which a request is logged as a warning
+app.config["REQUEST_LOG_LEVEL"] = os.environ.get("REQUEST_LOG_LEVEL", "INFO").upper()
+app.config["SQL_QUERY_BUDGET"] = int(os.environ.get("SQL_QUERY_BUDGET", 30))
+# Number of background threads running upload ingestion jobs
+app.config["INGEST_WORKERS"] = int(os.environ.get("INGEST_WORKERS", 2))
 # initialize the app with the extension
 db.init_app(app)
 
@@ -48,7 +143,7 @@ from models import User
 def load_user(user_id):
     return db.session.get(User, int(user_id))
 
-with app.app_context():
-    # Import all models here
-    import models  # noqa: F401
-    db.create_all()
+# The schema is not touched at import: several workers importing the app at
+# once would race on the same ALTER TABLEs and backfills. It is upgraded once
+# per start by gunicorn.conf.py, main.py or migrations.py (see README).
+import models  # noqa: F401,E402
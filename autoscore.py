@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, select, update
+
+from app import app, db
+from models import Response
+from timeframes import TIMEFRAME_COLUMNS
+
+# Suggested score columns on Response, keyed by the criterion they suggest
+SUGGESTION_COLUMNS = {
+    'period_string': 'suggested_score_period_string',
+    'period_timeframe': 'suggested_score_period_timeframe',
+    'location_string': 'suggested_score_location_string',
+    'location_qid': 'suggested_score_location_qid',
+}
+
+# Response columns the suggestions are computed from
+SOURCE_COLUMNS = ['gt_period', 'pred_period',
+                  'gt_preferred_location', 'gt_location',
+                  'gt_accepted_locations', 'pred_location',
+                  'gt_preferred_location_QID', 'gt_location_QID',
+                  'gt_acceptable_location_QIDs', 'pred_location_qid',
+                  *TIMEFRAME_COLUMNS]
+
+# Separators of the accepted location and QID lists
+LIST_SEPARATORS = r'\s*[,;|]\s*'
+QID_PATTERN = r'^Q\d+$'
+
+
+def _column(frame, name):
+    """
+    A column as normalised strings (trimmed, lower-case, '' when missing)
+    """
+    if name not in frame.columns:
+        return pd.Series('', index=frame.index, dtype=object)
+    values = frame[name]
+    return values.where(values.notna(), '').astype(str).str.strip().str.lower()
+
+
+def _first(frame, *names):
+    """
+    The first non-empty of several normalised columns
+    """
+    result = _column(frame, names[0])
+    for name in names[1:]:
+        result = result.where(result != '', _column(frame, name))
+    return result
+
+
+def _years(frame, name):
+    """
+    A parsed year column as floats (NaN when missing)
+    """
+    if name not in frame.columns:
+        return pd.Series(np.nan, index=frame.index)
+    return pd.to_numeric(frame[name], errors='coerce').astype(float)
+
+
+def _in_list(values, lists):
+    """
+    Whether each value appears in the separated list on the same row
+    """
+    items = lists.str.split(LIST_SEPARATORS).explode()
+    matches = items.eq(values.reindex(items.index)) & (items != '')
+    return matches.groupby(level=0).any().reindex(values.index, fill_value=False)
+
+
+def _suggest(*cases):
+    """
+    Score series from (condition, score) pairs, the first matching condition
+    winning; NaN where none holds
+    """
+    conditions, scores = zip(*cases)
+    return pd.Series(np.select(conditions, scores, np.nan),
+                     index=conditions[0].index)
+
+
+def suggest_scores(frame):
+    """
+    Compute suggested scores for a DataFrame of responses, whole columns at a
+    time. Only unambiguous cases get a suggestion, following the assessment
+    criteria: matching strings or intervals score 1, partly overlapping
+    intervals or a predicted location or QID found only among the accepted
+    ones score 0.5, and disjoint intervals or a well-formed QID outside them
+    score 0. Intervals are read from the columns of parse_timeframes and
+    only compared when both were parsed from explicit years; qualified or
+    vague timeframes ("after 1630", "1600s") get no suggestion. Everything
+    else is left to the annotator (NaN). Returns a DataFrame of
+    SUGGESTION_COLUMNS.
+    """
+    gt_period, pred_period = _column(frame, 'gt_period'), _column(frame, 'pred_period')
+    period_string = (gt_period != '') & (gt_period == pred_period)
+
+    # Intervals parsed from explicit years (see timeframes.py) are compared
+    # by overlap; anything else is left to the annotator
+    gt_start, gt_end = _years(frame, 'gt_timeframe_start'), _years(frame, 'gt_timeframe_end')
+    pred_start, pred_end = _years(frame, 'pred_timeframe_start'), _years(frame, 'pred_timeframe_end')
+    intervals = ((_column(frame, 'gt_timeframe_status') == 'parsed')
+                 & (_column(frame, 'pred_timeframe_status') == 'parsed')
+                 & gt_start.notna() & pred_start.notna())
+    same_interval = intervals & (gt_start == pred_start) & (gt_end == pred_end)
+    overlapping = intervals & (pred_start <= gt_end) & (pred_end >= gt_start)
+
+    pred_location = _column(frame, 'pred_location')
+    preferred = _first(frame, 'gt_preferred_location', 'gt_location')
+    location_string = (pred_location != '') & (pred_location == preferred)
+    accepted_location = (pred_location != '') & _in_list(
+        pred_location, _column(frame, 'gt_accepted_locations'))
+
+    pred_qid = _column(frame, 'pred_location_qid').str.upper()
+    preferred_qid = _first(frame, 'gt_preferred_location_QID',
+                           'gt_location_QID').str.upper()
+    acceptable_qids = _column(frame, 'gt_acceptable_location_QIDs').str.upper()
+    location_qid = (pred_qid != '') & (pred_qid == preferred_qid)
+    acceptable_qid = (pred_qid != '') & _in_list(pred_qid, acceptable_qids)
+    wrong_qid = (pred_qid.str.match(QID_PATTERN)
+                 & ((preferred_qid != '') | (acceptable_qids != '')))
+
+    return pd.DataFrame({
+        SUGGESTION_COLUMNS['period_string']: _suggest((period_string, 1.0)),
+        SUGGESTION_COLUMNS['period_timeframe']: _suggest(
+            (same_interval, 1.0), (overlapping, 0.5),
+            (intervals, 0.0)),
+        SUGGESTION_COLUMNS['location_string']: _suggest(
+            (location_string, 1.0), (accepted_location, 0.5)),
+        SUGGESTION_COLUMNS['location_qid']: _suggest(
+            (location_qid, 1.0), (acceptable_qid, 0.5), (wrong_qid, 0.0)),
+    }, index=frame.index)
+
+
+def backfill_suggested_scores(batch_size=None):
+    """
+    Compute the suggested scores of responses stored before suggestions
+    existed, in batches of keyset-ordered rows. Returns the number of rows.
+    """
+    batch_size = batch_size or app.config['INGEST_CHUNK_SIZE']
+    columns = [getattr(Response, name) for name in SOURCE_COLUMNS]
+    statement = update(Response.__table__).where(
+        Response.__table__.c.id == bindparam('b_id'))
+
+    updated, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            select(Response.id, *columns)
+            .where(Response.id > last_id)
+            .order_by(Response.id)
+            .limit(batch_size)).all()
+        if not rows:
+            break
+        frame = pd.DataFrame(rows, columns=['id'] + SOURCE_COLUMNS)
+        suggestions = suggest_scores(frame).astype(object)
+        suggestions = suggestions.where(suggestions.notna(), None)
+        suggestions['b_id'] = frame['id']
+        db.session.execute(statement, suggestions.to_dict('records'))
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+    return updated
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the assessment app: a synthetic evaluation-run generator
+(benchmarks.generate) and a runner timing ingestion, page views, search
+and export against a temporary database (benchmarks.run)
+"""
@@ -0,0 +1,128 @@
+import os
+import csv
+import random
+import sys
+
+# Importing utils sets up the app and its database; generating files needs
+# none, so use an in-memory one unless a database was configured
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from utils import RECOMMENDED_HEADERS  # noqa: E402
+
+AUTHORS = ['Molière', 'Racine', 'Corneille', 'Marivaux', 'Beaumarchais',
+           'Voltaire', 'Regnard', 'Scarron', 'Rotrou', 'Quinault', 'Hugo',
+           'Musset', 'Dumas', 'Crébillon', 'Lesage', 'Destouches']
+TITLE_WORDS = ['Le Misanthrope', "L'Avare", 'Britannicus', 'Le Cid',
+               'Les Fourberies', 'La Double Inconstance', 'Le Mariage',
+               'Zaïre', 'Le Joueur', 'Don Japhet', 'Venceslas', 'Atys',
+               'Hernani', 'Lorenzaccio', 'Antony', 'Rhadamiste']
+TITLE_SUFFIXES = ['', ' ou le Trompeur', ' de Figaro', ' amoureux',
+                  ' puni', ' ou la Fausse Suivante', ' et Titus', ' imaginaire']
+MODELS = ['gpt-4o', 'gpt-4o-mini', 'llama-3-70b', 'mistral-large',
+          'claude-3-5-sonnet', 'qwen2-72b']
+PERIODS = ['Antiquité', 'Antiquité grecque', 'Antiquité romaine', 'Moyen Âge',
+           'Renaissance', 'XVIe siècle', 'XVIIe siècle', 'XVIIIe siècle',
+           'XIXe siècle', 'Époque contemporaine']
+# (name, QID) pairs for settings of French plays
+LOCATIONS = [('Paris', 'Q90'), ('Rome', 'Q220'), ('Versailles', 'Q621'),
+             ('Madrid', 'Q2807'), ('Athènes', 'Q1524'), ('Venise', 'Q641'),
+             ('Londres', 'Q84'), ('Lyon', 'Q456'), ('Séville', 'Q8717'),
+             ('Naples', 'Q2634'), ('Vienne', 'Q1741'), ('Byzance', 'Q16869'),
+             ('Troie', 'Q22647'), ('Jérusalem', 'Q1218')]
+REASONING_SENTENCES = [
+    "Les personnages évoquent explicitement la cour du roi.",
+    "La didascalie initiale situe l'action dans une place publique.",
+    "Le texte mentionne des événements historiques identifiables.",
+    "Les costumes et les titres de noblesse suggèrent cette époque.",
+    "Plusieurs répliques font référence au sénat et aux consuls.",
+    "L'intrigue suit les conventions de la comédie de mœurs.",
+    "Aucune date n'est donnée, mais le contexte politique est clair.",
+    "Le valet parle de la ville comme d'un lieu proche du palais.",
+    "La liste des personnages indique la scène et le lieu.",
+    "Les références mythologiques renvoient au monde antique.",
+]
+
+
+def _timeframe(rng):
+    # Explicit year ranges only, with years of 3-4 digits even after the
+    # prediction is shifted by 10, so every row parses like a real run
+    start = rng.randrange(200, 1900, 10)
+    return start, start + rng.choice([10, 20, 50, 100])
+
+
+def _reasoning(rng, sentences):
+    return ' '.join(rng.choice(REASONING_SENTENCES) for _ in range(sentences))
+
+
+def _row(rng, index):
+    """
+    One synthetic response: document metadata, ground truth and a model
+    prediction that is right often enough to give realistic scores
+    """
+    gt_start, gt_end = _timeframe(rng)
+    if rng.random() < 0.6:
+        pred_start, pred_end = gt_start + rng.choice([-10, 0, 10]), gt_end
+    else:
+        pred_start, pred_end = _timeframe(rng)
+    gt_period = rng.choice(PERIODS)
+    location, qid = rng.choice(LOCATIONS)
+    accepted = [location] + [name for name, _ in rng.sample(LOCATIONS, 2)
+                             if name != location]
+    accepted_qids = [qid] + [q for name, q in LOCATIONS if name in accepted[1:]]
+    pred_location, pred_qid = ((location, qid) if rng.random() < 0.7
+                               else rng.choice(LOCATIONS))
+    model = rng.choice(MODELS)
+    document = index // len(MODELS)
+
+    row = dict.fromkeys(RECOMMENDED_HEADERS, '')
+    row.update({
+        'response_id': f'resp_{index:07d}',
+        'prompt_id': f'prompt_{rng.randint(1, 5)}',
+        'model_name': model,
+        'model_id': model,
+        'document_id': f'doc_{document:06d}',
+        'author': rng.choice(AUTHORS),
+        'title': rng.choice(TITLE_WORDS) + rng.choice(TITLE_SUFFIXES),
+        'publication_date': str(rng.randint(1630, 1890)),
+        'document_length': str(rng.randint(5000, 40000)),
+        'keep_fine_tuning': rng.choice(['True', 'False']),
+        'gt_period': gt_period,
+        'pred_period': gt_period if rng.random() < 0.6 else rng.choice(PERIODS),
+        'gt_timeframe': f'{gt_start}-{gt_end}',
+        'pred_timeframe': f'{pred_start}-{pred_end}',
+        'gt_period_reasoning': _reasoning(rng, rng.randint(2, 6)),
+        'pred_period_reasoning': _reasoning(rng, rng.randint(4, 12)),
+        'gt_preferred_location': location,
+        'gt_accepted_locations': ', '.join(accepted),
+        'pred_location': pred_location,
+        'gt_preferred_location_QID': qid,
+        'gt_acceptable_location_QIDs': ', '.join(accepted_qids),
+        'pred_location_qid': pred_qid,
+        'gt_location_reason': _reasoning(rng, rng.randint(1, 4)),
+        'pred_location_reasoning': _reasoning(rng, rng.randint(4, 12)),
+    })
+    return row
+
+
+def generate_tsv(path, rows, seed=0):
+    """
+    Write a synthetic evaluation run of the given number of rows as a TSV
+    with the recommended headers. The same seed gives the same file.
+    """
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.DictWriter(output, fieldnames=RECOMMENDED_HEADERS,
+                                delimiter='\t', lineterminator='\n')
+        writer.writeheader()
+        for index in range(rows):
+            writer.writerow(_row(rng, index))
+    return path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python -m benchmarks.generate ROWS OUTPUT.tsv [SEED]")
+        sys.exit(1)
+    generate_tsv(sys.argv[2], int(sys.argv[1]),
+                 int(sys.argv[3]) if len(sys.argv) > 3 else 0)
+    print(f"Wrote {sys.argv[1]} rows to {sys.argv[2]}")
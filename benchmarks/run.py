@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+
+# The app reads its configuration at import time: point it at a temporary
+# database and keep request logging quiet before importing it
+WORK_DIR = tempfile.mkdtemp(prefix='benchmark_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORK_DIR, 'benchmark.db')}"
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('REQUEST_LOG_LEVEL', 'DEBUG')
+
+from werkzeug.datastructures import FileStorage  # noqa: E402
+
+from main import app  # noqa: E402
+from app import db  # noqa: E402
+from models import User, CSVFile, Response  # noqa: E402
+from utils import (process_csv, search_responses, export_results_to_csv,  # noqa: E402
+                   delete_file_data)
+from migrations import upgrade_schema  # noqa: E402
+from benchmarks.generate import generate_tsv  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000]
+# Results are written here by default, one timestamped file per run
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+SEARCH_QUERIES = ['Molière', 'Paris', 'cour du roi', 'XVIIe']
+USERNAME, PASSWORD = 'benchmark', 'benchmark'
+
+
+def timed(func, repeat):
+    """
+    Run func repeat times and summarise the wall times in seconds
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return {
+        'repeat': repeat,
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'max': max(samples)
+    }
+
+
+def fetch(client, method, url, **kwargs):
+    """
+    Issue a request with the test client, reading and closing the response
+    so streamed bodies are included in the timing
+    """
+    response = client.open(url, method=method, **kwargs)
+    response.get_data()
+    response.close()
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method} {url} returned {response.status_code}")
+    return response
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_size(client, user_id, rows, repeat, seed):
+    """
+    Time every benchmark against a freshly uploaded file of the given size,
+    deleting the file afterwards
+    """
+    path = generate_tsv(os.path.join(WORK_DIR, f'run_{rows}.tsv'), rows, seed)
+    results = {}
+
+    with app.test_request_context():
+        with open(path, 'rb') as stream:
+            started = time.perf_counter()
+            success, message = process_csv(
+                FileStorage(stream=stream, filename=f'run_{rows}.tsv'), user_id)
+            elapsed = time.perf_counter() - started
+        if not success:
+            raise RuntimeError(message)
+        results['process_csv'] = {'repeat': 1, 'min': elapsed,
+                                  'median': elapsed, 'mean': elapsed,
+                                  'max': elapsed,
+                                  'rows_per_second': rows / elapsed}
+        csv_file = CSVFile.query.filter_by(user_id=user_id).order_by(
+            CSVFile.id.desc()).first()
+        file_id = csv_file.id
+        response_ids = [row[0] for row in db.session.query(Response.id).filter_by(
+            csv_file_id=file_id).order_by(Response.id)]
+
+    rng = random.Random(seed)
+    sample_ids = [rng.choice(response_ids) for _ in range(repeat)]
+    submit_ids = iter(response_ids)
+
+    results['dashboard'] = timed(
+        lambda: fetch(client, 'GET', '/dashboard'), repeat)
+    results['assessment_navigation'] = timed(
+        lambda: fetch(client, 'GET',
+                      f'/assessment/{file_id}?response_id={sample_ids.pop()}'),
+        repeat)
+    results['submit_assessment'] = timed(
+        lambda: fetch(client, 'POST',
+                      f'/submit_assessment/{file_id}/{next(submit_ids)}',
+                      data={'score_period_string': '1',
+                            'score_period_timeframe': '0.5',
+                            'score_location_string': '1',
+                            'score_location_qid': '0'}),
+        repeat)
+
+    with app.test_request_context():
+        queries = iter(SEARCH_QUERIES * repeat)
+        results['search_responses'] = timed(
+            lambda: search_responses(next(queries), user_id), repeat)
+        results['export_results_to_csv'] = timed(
+            lambda: export_results_to_csv(user_id, file_id), max(repeat // 5, 1))
+        results['delete_file'] = timed(lambda: delete_file_data(file_id), 1)
+
+    os.remove(path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time ingestion, page views, search and export on "
+                    "synthetic evaluation runs")
+    parser.add_argument('--rows', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated file sizes, e.g. "
+                             "1000,10000,100000,1000000")
+    parser.add_argument('--repeat', type=int, default=20,
+                        help="repetitions of each timed request")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output',
+                        help="results file (default: benchmarks/results/"
+                             "benchmark_<timestamp>.json)")
+    args = parser.parse_args()
+    if args.output is None:
+        timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+        args.output = os.path.join(RESULTS_DIR, f'benchmark_{timestamp}.json')
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        upgrade_schema()
+        user = User(username=USERNAME, email='benchmark@example.com')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client = app.test_client()
+    fetch(client, 'POST', '/login',
+          data={'username': USERNAME, 'password': PASSWORD})
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'results': {}
+    }
+    for rows in [int(size) for size in args.rows.split(',') if size]:
+        print(f"Benchmarking {rows} rows...", file=sys.stderr)
+        report['results'][str(rows)] = benchmark_size(
+            client, user_id, rows, args.repeat, args.seed)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+    print(f"Wrote benchmark results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+from sqlalchemy import Boolean, DateTime, Float, Integer
+
+# Parquet and Arrow IPC support is optional: it needs pyarrow, which the
+# TSV path does not
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ipc = pq = None
+
+# Upload extensions read as columnar files, and the type label of each
+COLUMNAR_EXTENSIONS = {
+    '.parquet': 'Parquet',
+    '.arrow': 'Arrow',
+    '.feather': 'Arrow',
+    '.ipc': 'Arrow',
+}
+COLUMNAR_TYPES = set(COLUMNAR_EXTENSIONS.values())
+
+MISSING_PYARROW = "Parquet and Arrow files require the pyarrow package"
+
+
+def columnar_available():
+    return pa is not None
+
+
+def _open_arrow(source):
+    """
+    Open an Arrow IPC file, or an IPC stream if it has no file footer.
+    Returns (schema, iterator of record batches).
+    """
+    try:
+        reader = ipc.open_file(source)
+        return reader.schema, (reader.get_batch(i)
+                               for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        reader = ipc.open_stream(source)
+        return reader.schema, iter(reader)
+
+
+def columnar_headers(source, file_type):
+    """
+    Read the column names of a Parquet or Arrow file from its schema alone
+    """
+    if file_type == 'Parquet':
+        return pq.ParquetFile(source).schema_arrow.names
+    schema, _ = _open_arrow(source)
+    return schema.names
+
+
+def iter_columnar_chunks(source, file_type, chunk_size):
+    """
+    Read a Parquet file row group by row group, or an Arrow file record
+    batch by record batch, as DataFrames of at most chunk_size rows with
+    the file's column types (integers, booleans, floats) kept. Integer
+    columns with nulls stay integers (objects) instead of becoming floats,
+    which would store 1630 as '1630.0' in the text columns.
+    """
+    if file_type == 'Parquet':
+        batches = pq.ParquetFile(source).iter_batches(batch_size=chunk_size)
+    else:
+        _, batches = _open_arrow(source)
+    for batch in batches:
+        for offset in range(0, batch.num_rows, chunk_size):
+            yield batch.slice(offset, chunk_size).to_pandas(
+                integer_object_nulls=True)
+
+
+def _arrow_type(column_type):
+    """
+    The Arrow type an exported SQLAlchemy column is written as
+    """
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp('s')
+    return pa.string()
+
+
+class _ChunkSink:
+    """
+    Write-only file object collecting what a writer wrote since the last
+    take(), while reporting the total size so writers can record offsets
+    """
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_columnar_export(columns, row_batches, file_type):
+    """
+    Write batches of rows as a Parquet file (one row group per batch) or an
+    Arrow IPC file (one record batch per batch), yielding the bytes written
+    for each batch so the file can be streamed. columns is a list of
+    (name, SQLAlchemy type) describing the rows.
+    """
+    schema = pa.schema([(name, _arrow_type(column_type))
+                        for name, column_type in columns])
+    sink = _ChunkSink()
+    if file_type == 'Parquet':
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema)
+        write = writer.write_table
+        to_batch = pa.Table.from_arrays
+    else:
+        writer = ipc.new_file(pa.PythonFile(sink, mode='w'), schema)
+        write = writer.write_batch
+        to_batch = pa.RecordBatch.from_arrays
+
+    for rows in row_batches:
+        if not rows:
+            continue
+        arrays = [pa.array(values, type=field.type)
+                  for values, field in zip(zip(*rows), schema)]
+        write(to_batch(arrays, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
@@ -1,7 +1,8 @@
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileRequired, FileAllowed
-from wtforms import DecimalField, StringField, PasswordField, SubmitField, FloatField, SearchField, RadioField
+from wtforms import DecimalField, StringField, PasswordField, SubmitField, FloatField, SearchField, RadioField, SelectField
 from wtforms.validators import DataRequired, InputRequired, Email, EqualTo, ValidationError, NumberRange, Length
+from columnar import columnar_available
 from models import User
 
 
@@ -41,8 +42,9 @@ class CSVUploadForm(FlaskForm):
     csv_file = FileField('Upload CSV/TSV File',
                          validators=[
                              FileRequired(),
-                             FileAllowed(['csv', 'tsv', 'txt'],
-                                         'CSV, TSV, or TXT files only!')
+                             FileAllowed(['csv', 'tsv', 'txt', 'parquet',
+                                          'arrow', 'feather', 'ipc'],
+                                         'CSV, TSV, TXT, Parquet or Arrow files only!')
                          ])
     submit = SubmitField('Upload')
 
@@ -77,4 +79,18 @@ class SearchForm(FlaskForm):
 
 
 class ExportForm(FlaskForm):
-    submit = SubmitField('Export to TSV')
+    format = SelectField('Format',
+                         choices=[('tsv', 'TSV'), ('parquet', 'Parquet'),
+                                  ('arrow', 'Arrow IPC')],
+                         default='tsv')
+    submit = SubmitField('Export')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Parquet and Arrow exports need the optional pyarrow package
+        if not columnar_available():
+            self.format.choices = [('tsv', 'TSV')]
+
+
+class AcceptSuggestionsForm(FlaskForm):
+    submit = SubmitField('Accept Suggested Scores')
@@ -0,0 +1,20 @@
+# Gunicorn reads this file from the working directory it is started in
+
+
+def on_starting(server):
+    """
+    Upgrade the database schema and clean up the background jobs cut short
+    when the server last stopped. This runs once, in the master process
+    before any worker is forked: done at import it would run in every
+    worker, racing on the same ALTER TABLEs and failing the uploads that the
+    other workers are ingesting.
+    """
+    from app import app, db
+    from migrations import upgrade_schema
+    from utils import recover_interrupted_uploads, resume_deletions
+    with app.app_context():
+        upgrade_schema()
+        recover_interrupted_uploads()
+        resume_deletions()
+        # Workers must not share the master's pooled connections
+        db.engine.dispose()
@@ -0,0 +1,87 @@
+import time
+import logging
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import app
+from metrics import REQUEST_LATENCY, REQUESTS, REQUESTS_IN_FLIGHT
+
+# Per-request timing lines are logged here at REQUEST_LOG_LEVEL, so they can
+# be shown or hidden apart from the rest of the application log. Unknown
+# level names fall back to INFO rather than failing every request.
+logger = logging.getLogger("request_stats")
+REQUEST_LOG_LEVEL = logging.getLevelNamesMapping().get(
+    app.config["REQUEST_LOG_LEVEL"])
+if REQUEST_LOG_LEVEL is None:
+    app.logger.warning(
+        f"Unknown REQUEST_LOG_LEVEL {app.config['REQUEST_LOG_LEVEL']!r}, "
+        "using INFO")
+    REQUEST_LOG_LEVEL = logging.INFO
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context,
+                      executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    # Statements run by background jobs have no request to charge them to
+    if has_request_context() and "request_stats" in g:
+        g.request_stats["sql_queries"] += 1
+        g.request_stats["sql_seconds"] += elapsed
+
+
+@app.before_request
+def start_request_timer():
+    REQUESTS_IN_FLIGHT.inc()
+    g.in_flight = True
+    g.request_stats = {
+        "start": time.perf_counter(),
+        "sql_queries": 0,
+        "sql_seconds": 0.0
+    }
+
+
+@app.after_request
+def log_request_stats(response):
+    """
+    Log wall time and SQL statement count/time of the request and record
+    its latency metrics once the response is closed, so the rows fetched
+    while streaming an export are included
+    """
+    stats = g.get("request_stats")
+    if stats is None:
+        return response
+    endpoint, method = request.endpoint or "unknown", request.method
+    status = response.status_code
+
+    def log():
+        duration = time.perf_counter() - stats["start"]
+        REQUEST_LATENCY.observe(duration, endpoint, method)
+        REQUESTS.inc(endpoint, method, str(status))
+        over_budget = stats["sql_queries"] > app.config["SQL_QUERY_BUDGET"]
+        logger.log(
+            max(logging.WARNING, REQUEST_LOG_LEVEL) if over_budget
+            else REQUEST_LOG_LEVEL,
+            "endpoint=%s method=%s status=%s duration_ms=%.1f "
+            "sql_queries=%d sql_ms=%.1f%s",
+            endpoint, method, status, duration * 1000,
+            stats["sql_queries"], stats["sql_seconds"] * 1000,
+            " over_query_budget" if over_budget else "")
+
+    response.call_on_close(log)
+    return response
+
+
+@app.teardown_request
+def end_request(exception=None):
+    # Runs even when the request failed before after_request, so the gauge
+    # cannot leak. stream_with_context pushes the same context again and
+    # runs the teardown a second time, so the flag is cleared on the first.
+    if g.pop("in_flight", False):
+        REQUESTS_IN_FLIGHT.dec()
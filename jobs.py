@@ -0,0 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
+from app import app
+
+# Local pool for long-running work (upload ingestion) that should not tie
+# up a request worker
+executor = ThreadPoolExecutor(max_workers=app.config["INGEST_WORKERS"],
+                              thread_name_prefix="ingest")
+
+
+def submit_job(func, *args, **kwargs):
+    """
+    Run func(*args, **kwargs) on the background pool inside an application
+    context, logging any exception it raises
+    """
+
+    def run():
+        with app.app_context():
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                app.logger.exception(f"Background job {func.__name__} failed")
+
+    return executor.submit(run)
@@ -0,0 +1,163 @@
+from sqlalchemy import and_, delete, func, insert, select, update
+from app import app, db
+from models import Assessment, CSVFile, Response, ScoreSummary
+from progress import SCORE_FIELDS
+
+# Leaderboard groups and the Response column each one is taken from
+SUMMARY_GROUPS = {
+    'model_name': 'model_name',
+    'prompt_id': 'prompt_id',
+    'period': 'gt_period',
+}
+
+
+def _group_columns():
+    """
+    The Response expressions of the summary groups, with '' for NULL so the
+    groups can be matched by equality
+    """
+    return [func.coalesce(getattr(Response, column), '').label(name)
+            for name, column in SUMMARY_GROUPS.items()]
+
+
+def summary_key(response):
+    """
+    The summary group of a Response (or a row with its group columns)
+    """
+    return tuple(getattr(response, column) or ''
+                 for column in SUMMARY_GROUPS.values())
+
+
+def response_summary_keys(response_ids):
+    """
+    Map response ids to their summary groups with one query
+    """
+    columns = [getattr(Response, column) for column in SUMMARY_GROUPS.values()]
+    return {row.id: summary_key(row)
+            for row in db.session.execute(
+                select(Response.id, *columns).where(Response.id.in_(response_ids)))}
+
+
+def rebuild_score_summary(csv_file_id=None):
+    """
+    Recompute the summary rows of all files (or one file) from the responses
+    and their owner's assessments, with one INSERT ... SELECT. Call within
+    the transaction that changed the file; the caller commits.
+    """
+    columns = [func.count(Assessment.id)]
+    for name in SCORE_FIELDS:
+        score = getattr(Assessment, f'score_{name}')
+        columns += [func.coalesce(func.sum(score), 0), func.count(score)]
+    groups = _group_columns()
+    query = select(CSVFile.user_id, Response.csv_file_id, *groups,
+                   func.count(Response.id), *columns)\
+        .join(CSVFile, CSVFile.id == Response.csv_file_id)\
+        .outerjoin(Assessment, and_(Assessment.response_id == Response.id,
+                                    Assessment.user_id == CSVFile.user_id))\
+        .group_by(CSVFile.user_id, Response.csv_file_id, *groups)
+
+    clear = delete(ScoreSummary)
+    if csv_file_id is not None:
+        query = query.where(Response.csv_file_id == csv_file_id)
+        clear = clear.where(ScoreSummary.csv_file_id == csv_file_id)
+    db.session.execute(clear.execution_options(synchronize_session=False))
+    result = db.session.execute(insert(ScoreSummary).from_select(
+        ['user_id', 'csv_file_id', *SUMMARY_GROUPS, 'response_count',
+         'assessed_count']
+        + [f'{name}_{part}' for name in SCORE_FIELDS for part in ('sum', 'count')],
+        query))
+    return result.rowcount
+
+
+def backfill_score_summary():
+    """
+    Rebuild every summary row and commit. Returns the number of rows.
+    """
+    rows = rebuild_score_summary()
+    db.session.commit()
+    return rows
+
+
+def record_summary_changes(csv_file_id, changes):
+    """
+    Update the summary rows of a file for new or changed assessments, as a
+    list of (summary key, old_scores, new_scores) with scores as
+    record_score_changes takes them. The increments of each group are summed
+    and applied in SQL, one update per group; call within the transaction
+    that saves the assessments.
+    """
+    deltas = {}
+    for key, old_scores, new_scores in changes:
+        delta = deltas.setdefault(key, {'assessed_count': 0})
+        if old_scores is None:
+            delta['assessed_count'] += 1
+            old_scores = {}
+        for name in SCORE_FIELDS:
+            old, new = old_scores.get(name), new_scores.get(name)
+            delta[f'{name}_sum'] = delta.get(f'{name}_sum', 0) + (new or 0) - (old or 0)
+            delta[f'{name}_count'] = (delta.get(f'{name}_count', 0)
+                                      + (new is not None) - (old is not None))
+
+    for key, delta in deltas.items():
+        values = {name: getattr(ScoreSummary, name) + value
+                  for name, value in delta.items() if value}
+        if not values:
+            continue
+        db.session.execute(
+            update(ScoreSummary)
+            .where(ScoreSummary.csv_file_id == csv_file_id,
+                   *[getattr(ScoreSummary, name) == value
+                     for name, value in zip(SUMMARY_GROUPS, key)])
+            .values(values)
+            .execution_options(synchronize_session=False))
+
+
+def remove_file_summary(csv_file_id):
+    """
+    Delete the summary rows of a file; the caller commits
+    """
+    db.session.execute(
+        delete(ScoreSummary).where(ScoreSummary.csv_file_id == csv_file_id)
+        .execution_options(synchronize_session=False))
+
+
+def get_leaderboard(user_id, group_by=('model_name',), limit=None):
+    """
+    Rank the groups (any of SUMMARY_GROUPS) of a user's ready files by their
+    overall average score, the mean of all assessed scores. Averages are
+    None for groups without assessments, which rank last.
+    """
+    limit = limit or app.config['LEADERBOARD_LIMIT']
+    groups = [getattr(ScoreSummary, name) for name in group_by]
+    sums = {name: func.sum(getattr(ScoreSummary, f'{name}_sum'))
+            for name in SCORE_FIELDS}
+    counts = {name: func.sum(getattr(ScoreSummary, f'{name}_count'))
+              for name in SCORE_FIELDS}
+    total_count = sum(counts.values())
+    overall = (sum(sums.values()) / func.nullif(total_count, 0)).label('overall')
+    query = select(
+        *groups,
+        func.count(func.distinct(ScoreSummary.csv_file_id)).label('files'),
+        func.sum(ScoreSummary.response_count).label('responses'),
+        func.sum(ScoreSummary.assessed_count).label('assessed'),
+        overall,
+        *[(sums[name] / func.nullif(counts[name], 0)).label(name)
+          for name in SCORE_FIELDS])\
+        .join(CSVFile, CSVFile.id == ScoreSummary.csv_file_id)\
+        .where(ScoreSummary.user_id == user_id, CSVFile.status == 'ready')\
+        .group_by(*groups)\
+        .order_by(overall.is_(None), overall.desc(), *groups)\
+        .limit(limit)
+
+    def average(value):
+        return round(value, 3) if value is not None else None
+
+    return [{
+        **{name: getattr(row, name) for name in group_by},
+        'files': row.files,
+        'responses': row.responses,
+        'assessed': row.assessed,
+        'overall': average(row.overall),
+        'avg_scores': {name: average(getattr(row, name))
+                       for name in SCORE_FIELDS},
+    } for row in db.session.execute(query)]
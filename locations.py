@@ -0,0 +1,165 @@
+import re
+
+import pandas as pd
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.orm import aliased
+
+from app import app, db
+from autoscore import LIST_SEPARATORS, QID_PATTERN
+from models import Assessment, CSVFile, Response, ResponseLocation
+
+# Ground-truth columns exploded into ResponseLocation rows, by kind: the
+# preferred value (with its fallback column) and the list of accepted ones
+LOCATION_SOURCES = {
+    'location': (('gt_preferred_location', 'gt_location'),
+                 'gt_accepted_locations'),
+    'qid': (('gt_preferred_location_QID', 'gt_location_QID'),
+            'gt_acceptable_location_QIDs'),
+}
+SOURCE_COLUMNS = [name for preferred, accepted in LOCATION_SOURCES.values()
+                  for name in (*preferred, accepted)]
+
+
+def _values(frame, name):
+    """
+    A column as trimmed strings ('' when missing)
+    """
+    if name not in frame.columns:
+        return pd.Series('', index=frame.index, dtype=object)
+    values = frame[name]
+    return values.where(values.notna(), '').astype(str).str.strip()
+
+
+def location_records(frame, response_ids):
+    """
+    Explode the ground-truth location and QID columns of a DataFrame of
+    responses into ResponseLocation insert parameters, given the ids of the
+    stored responses in the same order. A value that is both preferred and
+    accepted is stored once, as preferred.
+    """
+    response_ids = pd.Series(list(response_ids), index=frame.index)
+    parts = []
+    for kind, (preferred_names, accepted_name) in LOCATION_SOURCES.items():
+        preferred = _values(frame, preferred_names[0])
+        for name in preferred_names[1:]:
+            preferred = preferred.where(preferred != '', _values(frame, name))
+        accepted = _values(frame, accepted_name).str.split(LIST_SEPARATORS)\
+            .explode()
+        values = pd.concat([
+            pd.DataFrame({'value': preferred, 'is_preferred': True}),
+            pd.DataFrame({'value': accepted, 'is_preferred': False}),
+        ])
+        values['response_id'] = response_ids.reindex(values.index).values
+        values['kind'] = kind
+        if kind == 'qid':
+            values['value'] = values['value'].str.upper()
+        parts.append(values)
+
+    rows = pd.concat(parts, ignore_index=True)
+    rows['value'] = rows['value'].str.slice(0, 255)
+    rows = rows[rows['value'] != '']\
+        .drop_duplicates(['response_id', 'kind', 'value'])
+    return rows[['response_id', 'kind', 'value', 'is_preferred']]\
+        .astype(object).to_dict('records')
+
+
+def backfill_locations(batch_size=None):
+    """
+    Fill ResponseLocation from responses stored before it existed, in
+    batches of keyset-ordered rows. Returns the number of responses.
+    """
+    batch_size = batch_size or app.config['INGEST_CHUNK_SIZE']
+    columns = [getattr(Response, name) for name in SOURCE_COLUMNS]
+    insert_locations = ResponseLocation.__table__.insert()
+
+    processed, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            select(Response.id, *columns)
+            .where(Response.id > last_id)
+            .order_by(Response.id)
+            .limit(batch_size)).all()
+        if not rows:
+            break
+        frame = pd.DataFrame(rows, columns=['id'] + SOURCE_COLUMNS)
+        records = location_records(frame, frame['id'])
+        if records:
+            db.session.execute(insert_locations, records)
+        db.session.commit()
+        processed += len(rows)
+        last_id = rows[-1].id
+    return processed
+
+
+def is_qid(query):
+    """
+    Whether a search query is a single Wikidata QID such as "Q90"
+    """
+    return re.match(QID_PATTERN, query.strip().upper()) is not None
+
+
+def qid_response_ids(qid, user_id, limit, offset=0):
+    """
+    Return ids of the user's responses whose reference or acceptable QIDs
+    include qid, in id order, through the (kind, value) index. Files being
+    deleted are left out.
+    """
+    return list(db.session.scalars(
+        select(Response.id)
+        .join(ResponseLocation, ResponseLocation.response_id == Response.id)
+        .join(CSVFile, CSVFile.id == Response.csv_file_id)
+        .where(ResponseLocation.kind == 'qid',
+               ResponseLocation.value == qid.strip().upper(),
+               CSVFile.user_id == user_id, CSVFile.status != 'deleting')
+        .order_by(Response.id)
+        .limit(limit)
+        .offset(offset)))
+
+
+def location_statistics(user_id, csv_file_id=None, limit=100):
+    """
+    Per reference location of the user's ready files (or one file): the
+    number of responses, how many predicted the reference QID or one of the
+    acceptable QIDs, and the user's average location scores. Most frequent
+    locations first.
+    """
+    location = aliased(ResponseLocation)
+    matched_qid = aliased(ResponseLocation)
+    query = select(
+        location.value,
+        func.count(Response.id).label('responses'),
+        func.count(matched_qid.id).label('predicted_acceptable_qid'),
+        func.coalesce(func.sum(case((matched_qid.is_preferred, 1), else_=0)),
+                      0).label('predicted_reference_qid'),
+        func.count(Assessment.id).label('assessed'),
+        func.avg(Assessment.score_location_string).label('location_string'),
+        func.avg(Assessment.score_location_qid).label('location_qid'))\
+        .join(Response, Response.id == location.response_id)\
+        .join(CSVFile, CSVFile.id == Response.csv_file_id)\
+        .outerjoin(matched_qid, and_(
+            matched_qid.response_id == Response.id,
+            matched_qid.kind == 'qid',
+            matched_qid.value == func.upper(func.trim(Response.pred_location_qid))))\
+        .outerjoin(Assessment, and_(Assessment.response_id == Response.id,
+                                    Assessment.user_id == user_id))\
+        .where(location.kind == 'location', location.is_preferred,
+               CSVFile.user_id == user_id, CSVFile.status == 'ready')\
+        .group_by(location.value)\
+        .order_by(func.count(Response.id).desc(), location.value)\
+        .limit(limit)
+    if csv_file_id is not None:
+        query = query.where(CSVFile.id == csv_file_id)
+
+    return [{
+        'location': row.value,
+        'responses': row.responses,
+        'predicted_reference_qid': row.predicted_reference_qid,
+        'predicted_acceptable_qid': row.predicted_acceptable_qid,
+        'assessed': row.assessed,
+        'avg_scores': {
+            'location_string': round(row.location_string, 2)
+            if row.location_string is not None else None,
+            'location_qid': round(row.location_qid, 2)
+            if row.location_qid is not None else None,
+        }
+    } for row in db.session.execute(query)]
@@ -1,5 +1,15 @@
 from app import app
 import routes  # Import routes to register them
+import instrumentation  # Per-request timing and SQL query counts
 
 if __name__ == "__main__":
+    from migrations import upgrade_schema
+    from utils import recover_interrupted_uploads, resume_deletions
+    # Upgrade the schema, then clean up the background jobs that were running
+    # when the server last stopped (gunicorn does both in gunicorn.conf.py,
+    # once for all its workers)
+    with app.app_context():
+        upgrade_schema()
+        recover_interrupted_uploads()
+        resume_deletions()
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,160 @@
+import threading
+from bisect import bisect_left
+
+# In-process metrics rendered in the Prometheus text exposition format.
+# Values are kept per process: with several gunicorn workers, each one
+# reports its own series.
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"'
+                     for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter, optionally split by labels
+    """
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Unlabelled metrics are reported from zero
+        self.values = {} if self.labelnames else {(): 0}
+
+    def inc(self, *labelvalues, amount=1):
+        with _lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        for labelvalues, value in sorted(self.values.items()):
+            yield self.name, _labels(self.labelnames, labelvalues), value
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down
+    """
+    kind = 'gauge'
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observations, split by labels
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labelvalues -> [per-bucket counts (last one is +Inf), sum]
+        self.values = {}
+
+    def observe(self, value, *labelvalues):
+        with _lock:
+            counts, total = self.values.get(
+                labelvalues, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.values[labelvalues] = (counts, total + value)
+
+    def samples(self):
+        names = self.labelnames + ('le',)
+        for labelvalues, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield (f'{self.name}_bucket',
+                       _labels(names, labelvalues + (_format_value(bound),)),
+                       cumulative)
+            labels = _labels(self.labelnames, labelvalues)
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Request wall time in seconds, including streamed bodies',
+    ('endpoint', 'method'))
+REQUESTS = Counter('http_requests_total', 'Requests served',
+                   ('endpoint', 'method', 'status'))
+REQUESTS_IN_FLIGHT = Gauge('http_requests_in_flight',
+                           'Requests currently being served')
+UPLOAD_ROWS = Counter('upload_rows_ingested_total',
+                      'Response rows inserted from uploads')
+EXPORT_BYTES = Counter('export_bytes_streamed_total',
+                       'Bytes streamed by exports (TSV, Parquet or Arrow)')
+
+REGISTRY = [REQUEST_LATENCY, REQUESTS, REQUESTS_IN_FLIGHT, UPLOAD_ROWS,
+            EXPORT_BYTES]
+
+
+def count_bytes(chunks, counter=EXPORT_BYTES):
+    """
+    Pass through an iterable of text or bytes chunks, adding their size
+    (UTF-8 for text) to a counter as they are streamed
+    """
+    for chunk in chunks:
+        size = len(chunk.encode('utf-8')) if isinstance(chunk, str) else len(chunk)
+        counter.inc(amount=size)
+        yield chunk
+
+
+def pool_samples(engine):
+    """
+    Gauges describing the engine's connection pool, where the pool type
+    reports them
+    """
+    pool = engine.pool
+    for name, method in (('db_pool_size', 'size'),
+                         ('db_pool_checked_out', 'checkedout'),
+                         ('db_pool_checked_in', 'checkedin'),
+                         ('db_pool_overflow', 'overflow')):
+        if hasattr(pool, method):
+            yield name, getattr(pool, method)()
+
+
+def render(engine=None):
+    """
+    Render every metric, plus the pool gauges of engine if given, in the
+    Prometheus text exposition format
+    """
+    lines = []
+    with _lock:
+        for metric in REGISTRY:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+    if engine is not None:
+        for name, value in pool_samples(engine):
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
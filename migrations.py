@@ -0,0 +1,126 @@
+import sys
+from sqlalchemy import inspect, text
+from app import app, db
+from autoscore import backfill_suggested_scores
+from leaderboard import backfill_score_summary
+from locations import backfill_locations
+from progress import rebuild_progress
+from search_index import ensure_search_index
+from timeframes import backfill_timeframes
+from utils import backfill_positions
+
+
+def _column_ddl(column, dialect):
+    """
+    Render the column definition used by ALTER TABLE ... ADD COLUMN
+    """
+    preparer = dialect.identifier_preparer
+    ddl = f"{preparer.format_column(column)} {column.type.compile(dialect=dialect)}"
+    if column.server_default is not None:
+        default = column.server_default.arg
+        default = default.text if hasattr(default, 'text') else f"'{default}'"
+        ddl += f" DEFAULT {default}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+
+def _deduplicate_assessments(conn):
+    """
+    Keep only the most recently updated assessment per user and response so
+    that the unique index can be created
+    """
+    result = conn.execute(
+        text("DELETE FROM assessment WHERE EXISTS ("
+             "SELECT 1 FROM assessment AS newer "
+             "WHERE newer.response_id = assessment.response_id "
+             "AND newer.user_id = assessment.user_id "
+             "AND (newer.updated_at > assessment.updated_at "
+             "OR (newer.updated_at = assessment.updated_at "
+             "AND newer.id > assessment.id)))"))
+    if result.rowcount:
+        app.logger.warning(
+            f"Removed {result.rowcount} duplicate assessments")
+
+
+# Data fixes that must run before a given index can be created
+INDEX_PREREQUISITES = {
+    'uq_assessment_response_id_user_id': _deduplicate_assessments,
+}
+
+
+# Data rebuilt, in order, after a table is created or gains columns
+TABLE_BACKFILLS = {
+    # Suggestions are computed from the parsed timeframes
+    'response': (backfill_positions, backfill_timeframes,
+                 backfill_suggested_scores),
+    'response_location': (backfill_locations,),
+    'assessment_progress': (rebuild_progress,),
+    'score_summary': (backfill_score_summary,),
+}
+
+
+def rebuild_tables(table_names):
+    """
+    Run the backfills of the given tables again, e.g. after the parsing
+    they depend on changed
+    """
+    for table_name in table_names:
+        app.logger.info(f"Rebuilding {table_name}")
+        for backfill in TABLE_BACKFILLS[table_name]:
+            backfill()
+
+
+def upgrade_schema():
+    """
+    Bring an existing database up to date with the models: create missing
+    tables, add columns and indexes that were introduced after the table was
+    created and build the full-text search index
+    """
+    existing_tables = set(inspect(db.engine).get_table_names())
+    db.create_all()
+
+    inspector = inspect(db.engine)
+    dialect = db.engine.dialect
+    preparer = dialect.identifier_preparer
+    changed_tables = {table.name for table in db.metadata.sorted_tables
+                      if table.name not in existing_tables}
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                changed_tables.add(table.name)
+                app.logger.info(f"Adding column {table.name}.{column.name}")
+                conn.execute(
+                    text(f"ALTER TABLE {preparer.format_table(table)} "
+                         f"ADD COLUMN {_column_ddl(column, dialect)}"))
+
+            existing = {i['name'] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                app.logger.info(f"Creating index {index.name}")
+                if index.name in INDEX_PREREQUISITES:
+                    INDEX_PREREQUISITES[index.name](conn)
+                index.create(conn)
+
+    rebuild_tables([table_name for table_name in TABLE_BACKFILLS
+                    if table_name in changed_tables])
+
+    ensure_search_index()
+
+
+if __name__ == "__main__":
+    # python migrations.py [table ...]: upgrade the schema, then rebuild the
+    # data of the given tables (any of TABLE_BACKFILLS)
+    with app.app_context():
+        upgrade_schema()
+        print("Database schema is up to date!")
+        unknown = [name for name in sys.argv[1:] if name not in TABLE_BACKFILLS]
+        if unknown:
+            sys.exit(f"No backfills for: {', '.join(unknown)}")
+        rebuild_tables(sys.argv[1:])
+        if sys.argv[1:]:
+            print(f"Rebuilt {', '.join(sys.argv[1:])} successfully!")
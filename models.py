@@ -23,18 +23,41 @@ class User(UserMixin, db.Model):
 
 
 class CSVFile(db.Model):
+    __table_args__ = (
+        # Dashboard: a user's files, newest first
+        db.Index('ix_csv_file_user_id_upload_date', 'user_id', 'upload_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     total_responses = db.Column(db.Integer, default=0)
     assessed_responses = db.Column(db.Integer, default=0)
+    # Ingestion state: 'processing' while a background job inserts rows,
+    # then 'ready' or 'failed'; 'deleting' while a background job removes it
+    status = db.Column(db.String(20),
+                       nullable=False,
+                       default='ready',
+                       server_default='ready')
+    error_message = db.Column(db.Text, nullable=True)
+    processed_at = db.Column(db.DateTime, nullable=True)
 
     def __repr__(self):
         return f'<CSVFile {self.filename}>'
 
 
 class Response(db.Model):
+    __table_args__ = (
+        # Per-file scans ordered by id: navigation, next unassessed, export
+        db.Index('ix_response_csv_file_id_id', 'csv_file_id', 'id'),
+        # Timeframe range and overlap filters within a file
+        db.Index('ix_response_csv_file_id_gt_timeframe', 'csv_file_id',
+                 'gt_timeframe_start', 'gt_timeframe_end'),
+        db.Index('ix_response_csv_file_id_pred_timeframe', 'csv_file_id',
+                 'pred_timeframe_start', 'pred_timeframe_end'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     response_id = db.Column(db.String(255), nullable=False)
     prompt_id = db.Column(db.String(255), nullable=True)
@@ -48,23 +71,39 @@ class Response(db.Model):
     keep_fine_tuning = db.Column(db.Boolean, nullable=True)
 
     # Ground truth and predictions - Time/Period
+    # Long text columns are deferred in the 'reasoning' and 'ground_truth_lists'
+    # groups and only loaded where the assessment page renders them
     gt_period = db.Column(db.String(255), nullable=True)
     pred_period = db.Column(db.String(255), nullable=True)
     score_period_string = db.Column(db.String(255), nullable=True)
     gt_timeframe = db.Column(db.String(255), nullable=True)
     pred_timeframe = db.Column(db.String(255), nullable=True)
     score_period_timeframe = db.Column(db.String(255), nullable=True)
-    gt_period_reason = db.Column(db.Text, nullable=True)
-    gt_period_reasoning = db.Column(db.Text, nullable=True)
-    pred_period_reasoning = db.Column(db.Text, nullable=True)
+    gt_period_reason = db.deferred(db.Column(db.Text, nullable=True),
+                                   group='reasoning')
+    gt_period_reasoning = db.deferred(db.Column(db.Text, nullable=True),
+                                      group='reasoning')
+    pred_period_reasoning = db.deferred(db.Column(db.Text, nullable=True),
+                                        group='reasoning')
     score_period_reasoning = db.Column(db.String(255), nullable=True)
 
+    # Timeframes parsed at ingest time into years (see timeframes.py);
+    # status is 'parsed', 'missing' or 'invalid'
+    gt_timeframe_start = db.Column(db.Integer, nullable=True)
+    gt_timeframe_end = db.Column(db.Integer, nullable=True)
+    gt_timeframe_status = db.Column(db.String(20), nullable=True)
+    pred_timeframe_start = db.Column(db.Integer, nullable=True)
+    pred_timeframe_end = db.Column(db.Integer, nullable=True)
+    pred_timeframe_status = db.Column(db.String(20), nullable=True)
+
     # Ground truth and predictions - Location
     # New/renamed columns
     gt_preferred_location = db.Column(db.String(255), nullable=True)
-    gt_accepted_locations = db.Column(db.Text, nullable=True)  # New column
+    gt_accepted_locations = db.deferred(db.Column(db.Text, nullable=True),
+                                        group='ground_truth_lists')  # New column
     gt_preferred_location_QID = db.Column(db.String(255), nullable=True)
-    gt_acceptable_location_QIDs = db.Column(db.Text, nullable=True)  # New column
+    gt_acceptable_location_QIDs = db.deferred(db.Column(db.Text, nullable=True),
+                                              group='ground_truth_lists')  # New column
     
     # Keep old columns for backward compatibility
     gt_location = db.Column(db.String(255), nullable=True)
@@ -75,16 +114,28 @@ class Response(db.Model):
     score_location_string = db.Column(db.String(255), nullable=True)
     pred_location_qid = db.Column(db.String(255), nullable=True)
     score_location_qid = db.Column(db.String(255), nullable=True)
-    gt_location_reason = db.Column(db.Text, nullable=True)
-    pred_location_reasoning = db.Column(db.Text, nullable=True)
+    gt_location_reason = db.deferred(db.Column(db.Text, nullable=True),
+                                     group='reasoning')
+    pred_location_reasoning = db.deferred(db.Column(db.Text, nullable=True),
+                                          group='reasoning')
     score_location_reasoning = db.Column(db.String(255), nullable=True)
 
+    # Scores suggested at ingest time where the prediction can be checked
+    # mechanically (see autoscore.py); NULL where an annotator must decide
+    suggested_score_period_string = db.Column(db.Float, nullable=True)
+    suggested_score_period_timeframe = db.Column(db.Float, nullable=True)
+    suggested_score_location_string = db.Column(db.Float, nullable=True)
+    suggested_score_location_qid = db.Column(db.Float, nullable=True)
+
     # CSV file reference
     csv_file_id = db.Column(db.Integer,
                             db.ForeignKey('csv_file.id'),
                             nullable=False)
     csv_file = db.relationship('CSVFile',
                                backref=db.backref('responses', lazy=True))
+    # 1-based position within the file in id order, assigned at ingest time
+    # so navigation does not have to count rows
+    position = db.Column(db.Integer, nullable=True)
 
     # Assessment relationship
     assessment = db.relationship('Assessment',
@@ -95,7 +146,52 @@ class Response(db.Model):
         return f'<Response {self.response_id}>'
 
 
+class ResponseLocation(db.Model):
+    """Ground-truth locations and QIDs of a response, one row per value"""
+    __table_args__ = (
+        # One row per value of a response; also serves the
+        # pred_location_qid match join
+        db.Index('uq_response_location_response_id_kind_value',
+                 'response_id',
+                 'kind',
+                 'value',
+                 unique=True),
+        # Responses having a given location or QID
+        db.Index('ix_response_location_kind_value', 'kind', 'value'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    response_id = db.Column(db.Integer,
+                            db.ForeignKey('response.id'),
+                            nullable=False)
+    # 'location' (from gt_preferred_location/gt_accepted_locations) or
+    # 'qid' (from gt_preferred_location_QID/gt_acceptable_location_QIDs,
+    # upper-cased)
+    kind = db.Column(db.String(10), nullable=False)
+    value = db.Column(db.String(255), nullable=False)
+    # The reference value rather than one of the accepted alternatives
+    is_preferred = db.Column(db.Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f'<ResponseLocation {self.kind} {self.value}>'
+
+
+# Deferred Response column groups rendered by the assessment page
+RESPONSE_DETAIL_GROUPS = ('reasoning', 'ground_truth_lists')
+
+
 class Assessment(db.Model):
+    __table_args__ = (
+        # One assessment per user and response; also serves the
+        # "first unassessed response" anti-join probe
+        db.Index('uq_assessment_response_id_user_id',
+                 'response_id',
+                 'user_id',
+                 unique=True),
+        # A user's assessments joined to responses: counts and averages
+        db.Index('ix_assessment_user_id_response_id', 'user_id', 'response_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     response_id = db.Column(db.Integer,
                             db.ForeignKey('response.id'),
@@ -112,3 +208,85 @@ class Assessment(db.Model):
 
     def __repr__(self):
         return f'<Assessment for response {self.response_id}>'
+
+
+class AssessmentProgress(db.Model):
+    """Per-user, per-file assessment state, updated together with assessments"""
+    __table_args__ = (
+        db.Index('uq_assessment_progress_user_id_csv_file_id',
+                 'user_id',
+                 'csv_file_id',
+                 unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    csv_file_id = db.Column(db.Integer,
+                            db.ForeignKey('csv_file.id'),
+                            nullable=False)
+    # Work cursor: every response of the file with a lower id has been
+    # assessed by the user; None once the whole file is assessed
+    next_unassessed_id = db.Column(db.Integer, nullable=True)
+    # Last response the user viewed in this file
+    last_response_id = db.Column(db.Integer, nullable=True)
+
+    # Running totals of the user's assessments of this file; the average of
+    # each score is its sum divided by its count (NULL scores not counted)
+    assessed_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    period_string_sum = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    period_string_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    period_timeframe_sum = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    period_timeframe_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    location_string_sum = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    location_string_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    location_qid_sum = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    location_qid_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime,
+                           default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AssessmentProgress user {self.user_id} file {self.csv_file_id}>'
+
+
+class ScoreSummary(db.Model):
+    """
+    Assessment totals of a file's owner per (model, prompt, document period)
+    group of the file, kept up to date on ingest, submit and delete so the
+    leaderboard aggregates a small table instead of every assessment
+    """
+    __table_args__ = (
+        db.Index('uq_score_summary_csv_file_id_group',
+                 'csv_file_id',
+                 'model_name',
+                 'prompt_id',
+                 'period',
+                 unique=True),
+        # Leaderboard: a user's groups across files
+        db.Index('ix_score_summary_user_id_model_name', 'user_id', 'model_name'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    csv_file_id = db.Column(db.Integer,
+                            db.ForeignKey('csv_file.id'),
+                            nullable=False)
+    # Group of Response.model_name, prompt_id and gt_period; '' when empty
+    model_name = db.Column(db.String(255), nullable=False, default='', server_default='')
+    prompt_id = db.Column(db.String(255), nullable=False, default='', server_default='')
+    period = db.Column(db.String(255), nullable=False, default='', server_default='')
+
+    response_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Running totals as in AssessmentProgress
+    assessed_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    period_string_sum = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    period_string_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    period_timeframe_sum = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    period_timeframe_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    location_string_sum = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    location_string_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    location_qid_sum = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    location_qid_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return f'<ScoreSummary file {self.csv_file_id} {self.model_name}>'
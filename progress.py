@@ -0,0 +1,205 @@
+from sqlalchemy import and_, func, select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import Assessment, AssessmentProgress, CSVFile, Response
+
+# Scores kept as running sums and counts: Assessment.score_<name> is
+# accumulated in AssessmentProgress.<name>_sum and <name>_count
+SCORE_FIELDS = [
+    'period_string',
+    'period_timeframe',
+    'location_string',
+    'location_qid'
+]
+
+
+def find_unassessed_id(user_id, csv_file_id, start_id=None, conditions=()):
+    """
+    Return the lowest response id of the file, from start_id on, that the
+    user has not assessed yet and that meets the optional extra Response
+    conditions (None if there is none)
+    """
+    query = select(Response.id)\
+        .outerjoin(Assessment, and_(Assessment.response_id == Response.id,
+                                    Assessment.user_id == user_id))\
+        .where(Response.csv_file_id == csv_file_id, Assessment.id.is_(None),
+               *conditions)\
+        .order_by(Response.id)\
+        .limit(1)
+    if start_id is not None:
+        query = query.where(Response.id >= start_id)
+    return db.session.scalar(query)
+
+
+def first_response_id(csv_file_id, conditions=()):
+    """
+    Return the lowest response id of the file, among those meeting the
+    optional extra Response conditions
+    """
+    return db.session.scalar(
+        select(Response.id).where(Response.csv_file_id == csv_file_id,
+                                  *conditions)
+        .order_by(Response.id).limit(1))
+
+
+def _assessment_totals(csv_file_id=None, user_id=None):
+    """
+    Aggregate assessment counts and score sums per (user, file) straight from
+    the assessments table. Returns {(user_id, csv_file_id): row}.
+    """
+    columns = [func.count(Assessment.id).label('assessed_count')]
+    for name in SCORE_FIELDS:
+        score = getattr(Assessment, f'score_{name}')
+        columns += [func.coalesce(func.sum(score), 0).label(f'{name}_sum'),
+                    func.count(score).label(f'{name}_count')]
+
+    query = select(Assessment.user_id, Response.csv_file_id, *columns)\
+        .join(Response, Assessment.response_id == Response.id)\
+        .group_by(Assessment.user_id, Response.csv_file_id)
+    if csv_file_id is not None:
+        query = query.where(Response.csv_file_id == csv_file_id)
+    if user_id is not None:
+        query = query.where(Assessment.user_id == user_id)
+    return {(row.user_id, row.csv_file_id): row
+            for row in db.session.execute(query)}
+
+
+def _apply_totals(progress, totals):
+    """
+    Overwrite the running totals of a progress record
+    """
+    progress.assessed_count = totals.assessed_count if totals else 0
+    for name in SCORE_FIELDS:
+        setattr(progress, f'{name}_sum',
+                getattr(totals, f'{name}_sum') if totals else 0)
+        setattr(progress, f'{name}_count',
+                getattr(totals, f'{name}_count') if totals else 0)
+
+
+def get_progress(user_id, csv_file_id):
+    """
+    Return the user's progress record for a file, creating it (positioning
+    its work cursor and totalling existing assessments) the first time
+    """
+    progress = AssessmentProgress.query.filter_by(
+        user_id=user_id, csv_file_id=csv_file_id).first()
+    if progress is not None:
+        return progress
+
+    progress = AssessmentProgress(
+        user_id=user_id,
+        csv_file_id=csv_file_id,
+        next_unassessed_id=find_unassessed_id(user_id, csv_file_id))
+    _apply_totals(progress,
+                  _assessment_totals(csv_file_id, user_id).get(
+                      (user_id, csv_file_id)))
+    db.session.add(progress)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Created concurrently by another request
+        db.session.rollback()
+        progress = AssessmentProgress.query.filter_by(
+            user_id=user_id, csv_file_id=csv_file_id).one()
+    return progress
+
+
+def record_assessed(progress, response_id):
+    """
+    Advance the work cursor after the user assessed a response. Call within
+    the transaction that saves the assessment, after it has been added.
+    """
+    if progress.next_unassessed_id == response_id:
+        db.session.flush()
+        progress.next_unassessed_id = find_unassessed_id(
+            progress.user_id, progress.csv_file_id, response_id + 1)
+
+
+def record_scores(progress, old_scores, new_scores):
+    """
+    Update the running totals for a new assessment (old_scores is None) or a
+    changed one. Scores are dicts keyed by SCORE_FIELDS. The increments are
+    applied in SQL so concurrent submissions do not lose updates; call
+    within the transaction that saves the assessment.
+    """
+    record_score_changes(progress, [(old_scores, new_scores)])
+
+
+def record_score_changes(progress, changes):
+    """
+    Update the running totals for several assessments at once, as a list of
+    (old_scores, new_scores) pairs like record_scores takes. The increments
+    are summed so a single SQL update applies them.
+    """
+    assessed = 0
+    sums = dict.fromkeys(SCORE_FIELDS, 0)
+    counts = dict.fromkeys(SCORE_FIELDS, 0)
+    for old_scores, new_scores in changes:
+        if old_scores is None:
+            assessed += 1
+            old_scores = {}
+        for name in SCORE_FIELDS:
+            old, new = old_scores.get(name), new_scores.get(name)
+            sums[name] += (new or 0) - (old or 0)
+            counts[name] += (new is not None) - (old is not None)
+
+    if assessed:
+        progress.assessed_count = AssessmentProgress.assessed_count + assessed
+    for name in SCORE_FIELDS:
+        sum_column = getattr(AssessmentProgress, f'{name}_sum')
+        count_column = getattr(AssessmentProgress, f'{name}_count')
+        setattr(progress, f'{name}_sum', sum_column + sums[name])
+        setattr(progress, f'{name}_count', count_column + counts[name])
+
+
+def record_viewed(progress, response_id):
+    """
+    Remember the last response the user viewed in the file
+    """
+    if progress.last_response_id != response_id:
+        progress.last_response_id = response_id
+        db.session.commit()
+
+
+def progress_scores(progress):
+    """
+    Average scores of a progress record, as (averages, count) where missing
+    averages are None
+    """
+    averages = {}
+    for name in SCORE_FIELDS:
+        count = getattr(progress, f'{name}_count') if progress else 0
+        averages[name] = getattr(progress, f'{name}_sum') / count if count else None
+    return averages, progress.assessed_count if progress else 0
+
+
+def rebuild_progress(csv_file_id=None):
+    """
+    Recompute the running totals and work cursors of all progress records
+    (or those of one file) from the assessments table, creating records for
+    users who have assessments but none yet. Returns the number of records.
+    """
+    totals = _assessment_totals(csv_file_id)
+    query = AssessmentProgress.query
+    if csv_file_id is not None:
+        query = query.filter_by(csv_file_id=csv_file_id)
+    existing = {(p.user_id, p.csv_file_id): p for p in query}
+
+    for user_id, file_id in totals.keys() | existing.keys():
+        progress = existing.get((user_id, file_id))
+        if progress is None:
+            progress = AssessmentProgress(user_id=user_id, csv_file_id=file_id)
+            db.session.add(progress)
+        _apply_totals(progress, totals.get((user_id, file_id)))
+        progress.next_unassessed_id = find_unassessed_id(user_id, file_id)
+
+    # Keep the file-level counters (the owner's progress) in line
+    files = CSVFile.query
+    if csv_file_id is not None:
+        files = files.filter_by(id=csv_file_id)
+    for csv_file in files:
+        owner_totals = totals.get((csv_file.user_id, csv_file.id))
+        csv_file.assessed_responses = owner_totals.assessed_count if owner_totals else 0
+
+    db.session.commit()
+    return len(totals.keys() | existing.keys())
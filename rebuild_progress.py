@@ -0,0 +1,19 @@
+import sys
+from app import app, db
+from leaderboard import rebuild_score_summary
+from progress import rebuild_progress
+
+
+def rebuild(csv_file_id=None):
+    # Recompute progress counters, score sums and the leaderboard summary
+    # from the assessments table
+    with app.app_context():
+        count = rebuild_progress(csv_file_id)
+        print(f"Rebuilt {count} progress records successfully!")
+        count = rebuild_score_summary(csv_file_id)
+        db.session.commit()
+        print(f"Rebuilt {count} leaderboard summary rows successfully!")
+
+
+if __name__ == "__main__":
+    rebuild(int(sys.argv[1]) if len(sys.argv) > 1 else None)
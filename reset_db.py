@@ -1,13 +1,17 @@
 import os
 import sqlite3
 from app import app, db
+from search_index import drop_search_index, ensure_search_index
 
 def reset_database():
     # Get the database path from the app config
     with app.app_context():
-        # Drop all tables and recreate them
+        # Drop all tables (and the full-text index, which is not a model)
+        # and recreate them
+        drop_search_index()
         db.drop_all()
         db.create_all()
+        ensure_search_index()
         print("Database has been reset successfully!")
 
 if __name__ == "__main__":
@@ -1,20 +1,31 @@
-from flask import render_template, redirect, url_for, flash, request, jsonify, session, send_file, current_app
+from flask import render_template, redirect, url_for, flash, request, jsonify, session, current_app, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from urllib.parse import urlparse
-from io import StringIO, BytesIO
 import json
 import datetime
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+from sqlalchemy.exc import IntegrityError
 
 from app import app, db
-from forms import LoginForm, RegistrationForm, CSVUploadForm, AssessmentForm, SearchForm, ExportForm
-from models import User, CSVFile, Response, Assessment
-from utils import (validate_csv, process_csv, get_assessment_criteria,
-                   search_responses, calculate_average_scores,
-                   export_results_to_csv)
+from forms import LoginForm, RegistrationForm, CSVUploadForm, AssessmentForm, SearchForm, ExportForm, AcceptSuggestionsForm
+import metrics
+from models import (User, CSVFile, Response, Assessment,
+                    RESPONSE_DETAIL_GROUPS)
+from leaderboard import (SUMMARY_GROUPS, get_leaderboard,
+                         record_summary_changes, summary_key)
+from locations import location_statistics
+from progress import (get_progress, find_unassessed_id, first_response_id,
+                      record_assessed, record_scores, record_viewed)
+from timeframes import OVERLAP_FILTERS, timeframe_conditions, timeframe_filter
+from utils import (validate_csv, start_ingest_job, get_ingest_status,
+                   get_response_navigation, get_assessment_criteria,
+                   get_criteria_version, get_assessment_items, score_choice,
+                   accept_suggested_scores, save_assessment_batch,
+                   response_list_fields, next_response_cursor,
+                   iter_responses_json, search_responses, calculate_file_scores,
+                   progress_summary, get_statistics, EXPORT_FORMATS, iter_export,
+                   start_delete_job)
 
 
 # Make datetime available to all templates
@@ -23,6 +34,12 @@ def inject_datetime():
     return dict(datetime=datetime)
 
 
+# Make the assessment criteria version available as a template cache key
+@app.context_processor
+def inject_criteria_version():
+    return dict(criteria_version=get_criteria_version())
+
+
 @app.route('/')
 def index():
     if current_user.is_authenticated:
@@ -82,24 +99,27 @@ def dashboard():
     upload_form = CSVUploadForm()
     search_form = SearchForm()
 
-    csv_files = CSVFile.query.filter_by(user_id=current_user.id).order_by(
+    # Files being deleted in the background are no longer listed
+    csv_files = CSVFile.query.filter(
+        CSVFile.user_id == current_user.id,
+        CSVFile.status != 'deleting').order_by(
         CSVFile.upload_date.desc()).all()
 
-    # Handle CSV upload
+    # Handle CSV upload: rows are ingested by a background job
     if upload_form.validate_on_submit():
-        success, message = process_csv(upload_form.csv_file.data,
-                                       current_user.id)
+        success, message = start_ingest_job(upload_form.csv_file.data,
+                                            current_user.id)
         if success:
-            flash(message, 'success')
+            flash(message, 'info')
             return redirect(url_for('dashboard'))
         else:
             flash(message, 'danger')
 
-    # Calculate stats for each file
-    file_stats = []
-    for csv_file in csv_files:
-        avg_scores = calculate_average_scores(current_user.id, csv_file.id)
-        file_stats.append({'file': csv_file, 'avg_scores': avg_scores})
+    # Calculate stats for all files in one aggregate query
+    scores = calculate_file_scores(current_user.id,
+                                   [csv_file.id for csv_file in csv_files])
+    file_stats = [{'file': csv_file, 'avg_scores': scores[csv_file.id]}
+                  for csv_file in csv_files]
 
     return render_template('dashboard.html',
                            upload_form=upload_form,
@@ -107,68 +127,70 @@ def dashboard():
                            file_stats=file_stats)
 
 
+@app.route('/upload_status/<int:file_id>', methods=['GET'])
+@login_required
+def upload_status(file_id):
+    """Report ingestion progress of an uploaded file"""
+    csv_file = CSVFile.query.filter_by(id=file_id,
+                                       user_id=current_user.id).first_or_404()
+    return jsonify(get_ingest_status(csv_file))
+
+
 @app.route('/assessment/<int:file_id>', methods=['GET'])
 @login_required
 def assessment(file_id):
     csv_file = CSVFile.query.filter_by(id=file_id,
                                        user_id=current_user.id).first_or_404()
 
-    # Get response ID from query params or session, or get the first unassessed response
-    response_id = request.args.get('response_id')
+    if csv_file.status != 'ready':
+        flash(f'"{csv_file.filename}" is not ready for assessment yet.', 'warning')
+        return redirect(url_for('dashboard'))
+
+    # Get response ID from query params or the user's work cursor
+    response_id = request.args.get('response_id', type=int)
     next_unassessed = request.args.get('next_unassessed', type=bool)
-    
-    logging.debug(f"Assessment route called with file_id={file_id}, response_id={response_id}, next_unassessed={next_unassessed}")
-    
-    if next_unassessed:
-        # Always get the first unassessed response when next_unassessed is True (from dashboard)
-        logging.debug("Looking for first unassessed response (from dashboard)")
-        unassessed = Response.query.filter_by(csv_file_id=file_id)\
-            .outerjoin(Assessment, (Assessment.response_id == Response.id) & (Assessment.user_id == current_user.id))\
-            .filter(Assessment.id == None)\
-            .first()
-
-        if unassessed:
-            logging.debug(f"Found unassessed response with ID: {unassessed.id}")
-            response_id = unassessed.id
-        else:
-            logging.debug("No unassessed responses found, getting first response")
-            first_response = Response.query.filter_by(
-                csv_file_id=file_id).first()
-            if first_response:
-                response_id = first_response.id
-    elif not response_id:
-        # Try to get from session if no specific response_id is provided
-        response_id = session.get(f'last_response_{file_id}')
-        logging.debug(f"Retrieved response_id={response_id} from session")
+    progress = get_progress(current_user.id, file_id)
+
+    # Optional timeframe filter on the queue, kept in the page's links
+    queue_filter = timeframe_filter(request.args)
+    conditions = timeframe_conditions(**queue_filter)
 
+    # Drop navigation state kept in the session cookie by earlier versions
+    for key in [key for key in session if key.startswith('last_response_')]:
+        session.pop(key)
+
+    logging.debug("Assessment route called with file_id=%s, response_id=%s, next_unassessed=%s",
+                  file_id, response_id, next_unassessed)
+
+    if queue_filter and not response_id:
+        # First matching response the user has not assessed, else the
+        # first matching one
+        response_id = (find_unassessed_id(current_user.id, file_id,
+                                          conditions=conditions)
+                       or first_response_id(file_id, conditions))
         if not response_id:
-            # Get first unassessed response as fallback
-            logging.debug("No response ID in session, looking for first unassessed")
-            unassessed = Response.query.filter_by(csv_file_id=file_id)\
-                .outerjoin(Assessment, (Assessment.response_id == Response.id) & (Assessment.user_id == current_user.id))\
-                .filter(Assessment.id == None)\
-                .first()
-
-            if unassessed:
-                logging.debug(f"Found unassessed response with ID: {unassessed.id}")
-                response_id = unassessed.id
-            else:
-                # If all are assessed, get the first response
-                logging.debug("No unassessed responses found, getting first response")
-                first_response = Response.query.filter_by(
-                    csv_file_id=file_id).first()
-                if first_response:
-                    response_id = first_response.id
+            flash('No responses match this timeframe filter.', 'warning')
+            return redirect(url_for('assessment', file_id=file_id))
+    elif next_unassessed:
+        # Always go to the first unassessed response when next_unassessed is True (from dashboard)
+        response_id = progress.next_unassessed_id
+    elif not response_id:
+        # Resume where the user left off, or at the first unassessed response
+        response_id = progress.last_response_id or progress.next_unassessed_id
+
+    if not response_id:
+        # If all are assessed, get the first response
+        response_id = first_response_id(file_id)
 
     if not response_id:
         flash('No responses found in this file.', 'warning')
         return redirect(url_for('dashboard'))
 
-    # Store the current response ID in session
-    session[f'last_response_{file_id}'] = response_id
-
     response = Response.query.filter_by(id=response_id,
-                                        csv_file_id=file_id).first_or_404()
+                                        csv_file_id=file_id)\
+        .options(*[db.undefer_group(group)
+                   for group in RESPONSE_DETAIL_GROUPS])\
+        .first_or_404()
 
     # Get the assessment if it exists
     assessment = Assessment.query.filter_by(response_id=response.id,
@@ -177,53 +199,56 @@ def assessment(file_id):
     # Create a form with existing data if available
     form = AssessmentForm()
     if assessment:
-        form.score_period_string.data = assessment.score_period_string
-        form.score_period_timeframe.data = assessment.score_period_timeframe
-        form.score_location_string.data = assessment.score_location_string
-        form.score_location_qid.data = assessment.score_location_qid
+        form.score_period_string.data = score_choice(assessment.score_period_string)
+        form.score_period_timeframe.data = score_choice(assessment.score_period_timeframe)
+        form.score_location_string.data = score_choice(assessment.score_location_string)
+        form.score_location_qid.data = score_choice(assessment.score_location_qid)
+    else:
+        # Pre-select the scores suggested at ingest time
+        form.score_period_string.data = score_choice(response.suggested_score_period_string)
+        form.score_period_timeframe.data = score_choice(response.suggested_score_period_timeframe)
+        form.score_location_string.data = score_choice(response.suggested_score_location_string)
+        form.score_location_qid.data = score_choice(response.suggested_score_location_qid)
 
     # Get assessment criteria for tooltips
     criteria = get_assessment_criteria()
 
     # Get navigation data (next/prev, progress)
-    total_responses = Response.query.filter_by(csv_file_id=file_id).count()
-    assessed_count = Assessment.query.join(Response).filter(
-        Response.csv_file_id == file_id,
-        Assessment.user_id == current_user.id).count()
-
-    # Get the current index of this response
-    all_responses = Response.query.filter_by(csv_file_id=file_id).all()
-    response_ids = [r.id for r in all_responses]
-    logging.debug(f"All response IDs: {response_ids}")
-    logging.debug(f"Current response ID: {response.id}")
-    
-    current_index = response_ids.index(
-        response.id) if response.id in response_ids else 0
-    logging.debug(f"Current index: {current_index}")
-
-    # Calculate next and previous response IDs
-    prev_id = response_ids[current_index - 1] if current_index > 0 else None
-    next_id = response_ids[
-        current_index + 1] if current_index < len(response_ids) - 1 else None
-    logging.debug(f"Previous ID: {prev_id}, Next ID: {next_id}")
+    total_responses = csv_file.total_responses
+    assessed_count = progress.assessed_count
+
+    prev_id, next_id, current_index = get_response_navigation(
+        csv_file, response.id, conditions)
+    logging.debug("Response %s is at position %s (previous: %s, next: %s)",
+                  response.id, current_index, prev_id, next_id)
 
     # Get average scores
-    avg_scores = calculate_average_scores(current_user.id, file_id)
+    avg_scores = progress_summary(progress)
 
     export_form = ExportForm()
-
-    return render_template('assessment.html',
-                           form=form,
-                           export_form=export_form,
-                           response=response,
-                           file_id=file_id,
-                           criteria=criteria,
-                           total_responses=total_responses,
-                           assessed_count=assessed_count,
-                           prev_id=prev_id,
-                           next_id=next_id,
-                           current_index=current_index + 1,
-                           avg_scores=avg_scores)
+    accept_form = AcceptSuggestionsForm()
+
+    page = render_template('assessment.html',
+                         form=form,
+                         export_form=export_form,
+                         accept_form=accept_form,
+                         queue_filter=queue_filter,
+                         overlap_filters=OVERLAP_FILTERS,
+                         response=response,
+                         assessment=assessment,
+                         file_id=file_id,
+                         criteria=criteria,
+                         total_responses=total_responses,
+                         assessed_count=assessed_count,
+                         prev_id=prev_id,
+                         next_id=next_id,
+                         current_index=current_index,
+                         avg_scores=avg_scores)
+
+    # Recording the view commits and expires the loaded response, so it is
+    # done once the page is rendered rather than reloading the deferred groups
+    record_viewed(progress, response.id)
+    return page
 
 
 @app.route('/submit_assessment/<int:file_id>/<int:response_id>',
@@ -231,6 +256,7 @@ def assessment(file_id):
 @login_required
 def submit_assessment(file_id, response_id):
     form = AssessmentForm()
+    queue_filter = timeframe_filter(request.args)
 
     if form.validate_on_submit():
 
@@ -242,74 +268,230 @@ def submit_assessment(file_id, response_id):
         # Check if assessment already exists
         assessment = Assessment.query.filter_by(
             response_id=response_id, user_id=current_user.id).first()
-
-        if assessment:
-            # Update existing assessment
-            assessment.score_period_string = float(form.score_period_string.data)
-            assessment.score_period_timeframe = float(form.score_period_timeframe.data)
-            assessment.score_location_string = float(form.score_location_string.data)
-            assessment.score_location_qid = float(form.score_location_qid.data)
-            #assessment.score_space = form.score_space.data
-            assessment.updated_at = datetime.datetime.utcnow()
-            flash('Assessment updated successfully!', 'success')
+        progress = get_progress(current_user.id, file_id)
+
+        scores = {
+            'period_string': float(form.score_period_string.data),
+            'period_timeframe': float(form.score_period_timeframe.data),
+            'location_string': float(form.score_location_string.data),
+            'location_qid': float(form.score_location_qid.data)
+        }
+
+        try:
+            if assessment:
+                # Update the running totals with the changed scores
+                old_scores = {
+                    'period_string': assessment.score_period_string,
+                    'period_timeframe': assessment.score_period_timeframe,
+                    'location_string': assessment.score_location_string,
+                    'location_qid': assessment.score_location_qid
+                }
+                record_scores(progress, old_scores, scores)
+                record_summary_changes(file_id, [(summary_key(response),
+                                                  old_scores, scores)])
+
+                # Update existing assessment
+                assessment.score_period_string = float(form.score_period_string.data)
+                assessment.score_period_timeframe = float(form.score_period_timeframe.data)
+                assessment.score_location_string = float(form.score_location_string.data)
+                assessment.score_location_qid = float(form.score_location_qid.data)
+                #assessment.score_space = form.score_space.data
+                assessment.updated_at = datetime.datetime.utcnow()
+                message = 'Assessment updated successfully!'
+            else:
+                # Create new assessment
+                assessment = Assessment(
+                    response_id=response_id,
+                    user_id=current_user.id,
+                    score_period_string=float(form.score_period_string.data),
+                    score_period_timeframe=float(form.score_period_timeframe.data),
+                    score_location_string=float(form.score_location_string.data),
+                    score_location_qid=float(form.score_location_qid.data),
+                )
+                db.session.add(assessment)
+                message = 'Assessment submitted successfully!'
+
+                # Update the assessed count for the CSV file
+                csv_file = response.csv_file
+                csv_file.assessed_responses = CSVFile.assessed_responses + 1
+
+                # Update the running totals and advance the work cursor in the
+                # same transaction
+                record_scores(progress, None, scores)
+                record_summary_changes(file_id, [(summary_key(response),
+                                                  None, scores)])
+                record_assessed(progress, response_id)
+
+            db.session.commit()
+        except IntegrityError:
+            # The same assessment was saved concurrently, e.g. by a double
+            # submit of the form: keep that one
+            db.session.rollback()
+            flash('This response was assessed at the same time from another '
+                  'request, please check the scores and resubmit if needed.',
+                  'warning')
+            return redirect(
+                url_for('assessment', file_id=file_id,
+                        response_id=response_id, **queue_filter))
+        flash(message, 'success')
+
+        if queue_filter:
+            next_id = find_unassessed_id(
+                current_user.id, file_id,
+                conditions=timeframe_conditions(**queue_filter))
+            if next_id is None:
+                flash('All responses matching the timeframe filter have been assessed.', 'success')
+                return redirect(url_for('assessment', file_id=file_id))
         else:
-            # Create new assessment
-            assessment = Assessment(
-                response_id=response_id,
-                user_id=current_user.id,
-                score_period_string=float(form.score_period_string.data),
-                score_period_timeframe=float(form.score_period_timeframe.data),
-                score_location_string=float(form.score_location_string.data),
-                score_location_qid=float(form.score_location_qid.data),
-            )
-            db.session.add(assessment)
-            flash('Assessment submitted successfully!', 'success')
-
-            # Update the assessed count for the CSV file
-            csv_file = CSVFile.query.get(file_id)
-            csv_file.assessed_responses = Assessment.query.join(
-                Response).filter(
-                    Response.csv_file_id == file_id,
-                    Assessment.user_id == current_user.id).count()
-
-        db.session.commit()
-
-        # Check if all responses have been assessed
-        total_responses = Response.query.filter_by(csv_file_id=file_id).count()
-        assessed_count = Assessment.query.join(Response).filter(
-            Response.csv_file_id == file_id,
-            Assessment.user_id == current_user.id).count()
-        
-        logging.debug(f"Total responses: {total_responses}, Assessed count: {assessed_count}")
-        
-        if assessed_count >= total_responses:
+            next_id = progress.next_unassessed_id
+        if next_id is None:
             # All responses have been assessed
             flash('🎉 Congratulations! You have assessed all responses for this file. (100% complete)', 'success')
             return redirect(url_for('dashboard'))
-            
-        # Get next unassessed response
-        unassessed = Response.query.filter_by(csv_file_id=file_id)\
-            .outerjoin(Assessment, (Assessment.response_id == Response.id) & (Assessment.user_id == current_user.id))\
-            .filter(Assessment.id == None)\
-            .first()
-            
-        if unassessed:
-            logging.debug(f"Redirecting to next unassessed response: {unassessed.id}")
-            return redirect(
-                url_for('assessment',
-                        file_id=file_id,
-                        response_id=unassessed.id))
-        else:
-            # If all are assessed (double-check), redirect to dashboard with success message
-            flash('🎉 Great job! You have assessed all responses for this file.', 'success')
-            return redirect(url_for('dashboard'))
+
+        logging.debug("Redirecting to next unassessed response: %s", next_id)
+        return redirect(
+            url_for('assessment', file_id=file_id, response_id=next_id,
+                    **queue_filter))
 
     for field, errors in form.errors.items():
         for error in errors:
             flash(f"{field}: {error}", 'danger')
 
     return redirect(
-        url_for('assessment', file_id=file_id, response_id=response_id))
+        url_for('assessment', file_id=file_id, response_id=response_id,
+                **queue_filter))
+
+
+@app.route('/submit_assessments/<int:file_id>', methods=['POST'])
+@login_required
+def submit_assessments(file_id):
+    """
+    Save a batch of assessments posted as JSON:
+    {"assessments": [{"response_id": ..., "score_period_string": ..., ...}]}
+    Prefetched items follow the timeframe filter of the query string.
+    """
+    csv_file = CSVFile.query.filter_by(id=file_id,
+                                       user_id=current_user.id).first_or_404()
+    if csv_file.status != 'ready':
+        return jsonify({'error': f'"{csv_file.filename}" is not ready for assessment'}), 409
+
+    data = request.get_json(silent=True)
+    items = data.get('assessments') if isinstance(data, dict) else None
+    prefetch = data.get('prefetch') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return jsonify({'error': 'Expected a JSON object with an assessments list'}), 400
+    if len(items) > app.config['ASSESSMENT_BATCH_MAX']:
+        return jsonify({'error': f"At most {app.config['ASSESSMENT_BATCH_MAX']} "
+                                 'assessments can be submitted at once'}), 413
+
+    success, message, results = save_assessment_batch(csv_file,
+                                                      current_user.id, items)
+    if not success:
+        return jsonify({'error': message}), 409
+    logging.debug("%s for file %s", message, file_id)
+
+    progress = get_progress(current_user.id, file_id)
+    output = {
+        'results': results,
+        'assessed': progress.assessed_count,
+        'total': csv_file.total_responses,
+        'next_unassessed_id': progress.next_unassessed_id
+    }
+
+    # Optionally return the next items to show: {"after_id": ..., "limit": ...}
+    if isinstance(prefetch, dict) and isinstance(prefetch.get('after_id'), int):
+        limit = prefetch.get('limit', app.config['ASSESSMENT_PREFETCH_SIZE'])
+        if not isinstance(limit, int):
+            limit = app.config['ASSESSMENT_PREFETCH_SIZE']
+        output['items'] = get_assessment_items(
+            current_user.id, csv_file, prefetch['after_id'],
+            min(max(limit, 1), app.config['ASSESSMENT_BATCH_MAX']),
+            timeframe_conditions(**timeframe_filter(request.args)))
+    return jsonify(output)
+
+
+@app.route('/assessment_items/<int:file_id>', methods=['GET'])
+@login_required
+def assessment_items(file_id):
+    """
+    Get the next responses the user has not assessed after after_id, for the
+    assessment page to prefetch; takes the timeframe filter of the page
+    """
+    csv_file = CSVFile.query.filter_by(id=file_id,
+                                       user_id=current_user.id).first_or_404()
+    after_id = request.args.get('after_id', 0, type=int)
+    limit = request.args.get('limit',
+                             app.config['ASSESSMENT_PREFETCH_SIZE'],
+                             type=int)
+    limit = min(max(limit, 1), app.config['ASSESSMENT_BATCH_MAX'])
+    conditions = timeframe_conditions(**timeframe_filter(request.args))
+    return jsonify({'items': get_assessment_items(current_user.id, csv_file,
+                                                  after_id, limit, conditions)})
+
+
+@app.route('/statistics', methods=['GET'])
+@login_required
+def statistics():
+    """
+    Assessment progress and average scores of the current user, overall or
+    for one file (file_id query parameter)
+    """
+    return jsonify(get_statistics(current_user.id,
+                                  request.args.get('file_id', type=int)))
+
+
+@app.route('/location_statistics', methods=['GET'])
+@login_required
+def location_statistics_view():
+    """
+    Response counts, QID matches and average location scores per reference
+    location, overall or for one file (file_id query parameter)
+    """
+    limit = request.args.get('limit', app.config['LOCATION_STATS_LIMIT'],
+                             type=int)
+    return jsonify({'locations': location_statistics(
+        current_user.id, request.args.get('file_id', type=int),
+        max(limit, 1))})
+
+
+def leaderboard_groups():
+    """
+    The leaderboard grouping from the group_by parameter (repeated or
+    comma-separated), by model name unless valid groups are given
+    """
+    names = [name.strip() for value in request.args.getlist('group_by')
+             for name in value.split(',')]
+    return [name for name in SUMMARY_GROUPS if name in names] or ['model_name']
+
+
+@app.route('/leaderboard', methods=['GET'])
+@login_required
+def leaderboard():
+    group_by = leaderboard_groups()
+    return render_template('leaderboard.html',
+                           rows=get_leaderboard(current_user.id, group_by),
+                           group_by=group_by,
+                           summary_groups=SUMMARY_GROUPS)
+
+
+@app.route('/leaderboard.json', methods=['GET'])
+@login_required
+def leaderboard_json():
+    """
+    The leaderboard of the current user's files, grouped by the group_by
+    parameter (model_name, prompt_id and/or period)
+    """
+    group_by = leaderboard_groups()
+    return jsonify({'group_by': group_by,
+                    'leaderboard': get_leaderboard(current_user.id, group_by)})
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Operational metrics in the Prometheus text format"""
+    return app.response_class(metrics.render(db.engine),
+                              mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/search', methods=['POST'])
@@ -318,7 +500,8 @@ def search():
     form = SearchForm()
     if form.validate_on_submit():
         query = form.query.data
-        results = search_responses(query, current_user.id)
+        page = max(request.form.get('page', 1, type=int), 1)
+        results, has_more = search_responses(query, current_user.id, page)
 
         # Group results by CSV file
         grouped_results = {}
@@ -334,7 +517,9 @@ def search():
         return render_template('dashboard.html',
                                upload_form=CSVUploadForm(),
                                search_form=form,
-                               search_results=grouped_results)
+                               search_results=grouped_results,
+                               search_page=page,
+                               search_has_more=has_more)
 
     flash('Invalid search query', 'danger')
     return redirect(url_for('dashboard'))
@@ -343,39 +528,42 @@ def search():
 @app.route('/export/<int:file_id>', methods=['POST'])
 @login_required
 def export(file_id):
-    logging.debug(f"Export route called for file_id={file_id}")
+    logging.debug("Export route called for file_id=%s", file_id)
     form = ExportForm()
     if form.validate_on_submit():
-        logging.debug("Export form validated")
-        csv_data = export_results_to_csv(current_user.id, file_id)
-        logging.debug(f"CSV data returned: {bool(csv_data)}")
-        if csv_data:
-            # Create a response with TSV data
-            csv_file = CSVFile.query.get_or_404(file_id)
-            now = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-            filename = f"assessment_results_{csv_file.filename.split('.')[0]}_{now}.tsv"
-
-            # Convert string data to bytes for BytesIO
-            try:
-                logging.debug(f"Converting CSV data to bytes (length: {len(csv_data)})")
-                output = BytesIO()
-                output.write(csv_data.encode('utf-8'))
-                output.seek(0)
-                logging.debug("BytesIO conversion successful")
-            except Exception as e:
-                logging.error(f"Error converting to BytesIO: {str(e)}")
-                import traceback
-                logging.error(traceback.format_exc())
-                flash(f'Error preparing export file: {str(e)}', 'danger')
-                return redirect(url_for('assessment', file_id=file_id))
-            
-            return send_file(output,
-                             mimetype='text/tab-separated-values',
-                             as_attachment=True,
-                             download_name=filename)
-        else:
-            flash('Error generating export file', 'danger')
+        csv_file = CSVFile.query.filter_by(
+            id=file_id, user_id=current_user.id).first_or_404()
+        export_format = form.format.data
+        _, mimetype, extension = EXPORT_FORMATS[export_format]
+        now = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+        filename = f"assessment_results_{csv_file.filename.split('.')[0]}_{now}.{extension}"
+
+        # Stream rows to the client as they are fetched
+        output = app.response_class(
+            stream_with_context(metrics.count_bytes(
+                iter_export(current_user.id, file_id, export_format))),
+            mimetype=mimetype)
+        output.headers.set('Content-Disposition', 'attachment',
+                           filename=filename)
+        return output
+
+    flash('Error generating export file', 'danger')
+    return redirect(url_for('assessment', file_id=file_id))
+
 
+@app.route('/accept_suggestions/<int:file_id>', methods=['POST'])
+@login_required
+def accept_suggestions(file_id):
+    """Accept the suggested scores of every unassessed response in a file
+    that has a suggestion for all criteria"""
+    csv_file = CSVFile.query.filter_by(id=file_id,
+                                       user_id=current_user.id).first_or_404()
+    form = AcceptSuggestionsForm()
+    if form.validate_on_submit() and csv_file.status == 'ready':
+        success, message = accept_suggested_scores(csv_file, current_user.id)
+        flash(message, 'success' if success else 'warning')
+    else:
+        flash('Could not accept the suggested scores', 'danger')
     return redirect(url_for('assessment', file_id=file_id))
 
 
@@ -385,46 +573,47 @@ def delete_file(file_id):
     """Delete a CSV file and all associated responses and assessments"""
     # Ensure the user owns this file
     csv_file = CSVFile.query.filter_by(id=file_id, user_id=current_user.id).first_or_404()
-    
-    try:
-        # Get all responses for this file
-        responses = Response.query.filter_by(csv_file_id=file_id).all()
-        
-        # Delete all associated assessments first
-        for response in responses:
-            assessments = Assessment.query.filter_by(response_id=response.id).all()
-            for assessment in assessments:
-                db.session.delete(assessment)
-        
-        # Delete all responses
-        for response in responses:
-            db.session.delete(response)
-        
-        # Delete the file record
-        db.session.delete(csv_file)
-        db.session.commit()
-        
-        flash(f'Job "{csv_file.filename}" and all associated data deleted successfully.', 'success')
-    except Exception as e:
-        db.session.rollback()
-        logging.error(f"Error deleting file: {str(e)}")
-        flash(f'Error deleting file: {str(e)}', 'danger')
-    
+
+    if csv_file.status == 'processing':
+        flash(f'"{csv_file.filename}" is still being processed and cannot be deleted yet.', 'warning')
+        return redirect(url_for('dashboard'))
+
+    success, message = start_delete_job(csv_file)
+    flash(message, 'success' if success else 'danger')
+
     return redirect(url_for('dashboard'))
 
 
 @app.route('/responses/<int:file_id>', methods=['GET'])
 @login_required
 def get_responses(file_id):
-    """Get all responses for a file for client-side navigation"""
+    """
+    Get a page of responses for a file for client-side navigation.
+
+    Query parameters: after_id (keyset cursor, default 0), limit (page size)
+    and fields (comma-separated columns, default id,author,title). The
+    cursor for the next page is returned in the X-Next-After-Id header.
+    """
     # Check user has access to this file
     csv_file = CSVFile.query.filter_by(id=file_id,
                                      user_id=current_user.id).first_or_404()
-    
-    # Get all responses for this file
-    responses = Response.query.filter_by(csv_file_id=file_id).all()
-    
-    # Convert to JSON-serializable format
-    response_data = [{'id': r.id, 'author': r.author, 'title': r.title} for r in responses]
-    
-    return jsonify(response_data)
+
+    fields, unknown = response_list_fields(request.args.get('fields'))
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    after_id = request.args.get('after_id', 0, type=int)
+    limit = request.args.get('limit',
+                             app.config['RESPONSES_PAGE_SIZE'],
+                             type=int)
+    limit = min(max(limit, 1), app.config['RESPONSES_MAX_PAGE_SIZE'])
+
+    next_after_id = next_response_cursor(file_id, after_id, limit)
+
+    output = app.response_class(
+        stream_with_context(
+            iter_responses_json(file_id, fields, after_id, limit)),
+        mimetype='application/json')
+    if next_after_id is not None:
+        output.headers['X-Next-After-Id'] = str(next_after_id)
+    return output
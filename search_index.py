@@ -0,0 +1,161 @@
+import re
+from sqlalchemy import and_, func, literal_column, or_, select, text
+from app import app, db
+from models import CSVFile, Response
+
+# Response columns covered by the full-text index
+SEARCH_COLUMNS = [
+    'author',
+    'title',
+    'response_id',
+    'document_id',
+    'model_name',
+    'model_id',
+    'prompt_id',
+    'gt_period',
+    'pred_period',
+    'gt_timeframe',
+    'pred_timeframe',
+    'gt_preferred_location',
+    'gt_accepted_locations',
+    'gt_preferred_location_QID',
+    'gt_acceptable_location_QIDs',
+    'gt_location',
+    'pred_location'
+]
+
+FTS_TABLE = 'response_fts'
+PG_INDEX = 'ix_response_search'
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def _pg_document():
+    """
+    The tsvector expression indexed on Postgres; queries must use exactly
+    the same expression for the planner to pick the GIN index
+    """
+    document = None
+    for name in SEARCH_COLUMNS:
+        value = func.coalesce(getattr(Response, name), literal_column("''"))
+        document = value if document is None else \
+            document.op('||')(literal_column("' '")).op('||')(value)
+    return func.to_tsvector(literal_column("'simple'::regconfig"), document)
+
+
+def ensure_search_index():
+    """
+    Create the full-text index if it does not exist yet: an FTS5 table keyed
+    by response id on SQLite (backfilled from existing rows) or a GIN
+    expression index on Postgres. Other backends fall back to LIKE scans.
+    """
+    dialect = _dialect()
+    with db.engine.begin() as conn:
+        if dialect == 'sqlite':
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = :name"),
+                {"name": FTS_TABLE}).first()
+            if exists:
+                return
+            app.logger.info(f"Creating full-text index {FTS_TABLE}")
+            columns = ', '.join(SEARCH_COLUMNS)
+            conn.execute(
+                text(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({columns}, "
+                     "tokenize='unicode61 remove_diacritics 2', "
+                     "prefix='2 3')"))
+            conn.execute(
+                text(f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+                     f"SELECT id, {columns} FROM response"))
+        elif dialect == 'postgresql':
+            document = _pg_document().compile(
+                dialect=db.engine.dialect,
+                compile_kwargs={"literal_binds": True})
+            conn.execute(
+                text(f"CREATE INDEX IF NOT EXISTS {PG_INDEX} "
+                     f"ON response USING GIN (({document}))"))
+
+
+def drop_search_index():
+    """
+    Drop the SQLite FTS5 table, which db.drop_all() does not know about (the
+    Postgres index is dropped with the response table)
+    """
+    if _dialect() != 'sqlite':
+        return
+    with db.engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+
+
+def index_file_responses(csv_file_id):
+    """
+    Add the responses of a file to the full-text index (SQLite only; the
+    Postgres expression index is maintained by the database)
+    """
+    if _dialect() != 'sqlite':
+        return
+    columns = ', '.join(SEARCH_COLUMNS)
+    db.session.execute(
+        text(f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+             f"SELECT id, {columns} FROM response "
+             "WHERE csv_file_id = :csv_file_id"),
+        {"csv_file_id": csv_file_id})
+
+
+def remove_file_responses(csv_file_id):
+    """
+    Remove the responses of a file from the full-text index. Must run before
+    the response rows themselves are deleted.
+    """
+    if _dialect() != 'sqlite':
+        return
+    db.session.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+             "(SELECT id FROM response WHERE csv_file_id = :csv_file_id)"),
+        {"csv_file_id": csv_file_id})
+
+
+def search_response_ids(query, user_id, limit, offset=0):
+    """
+    Return ids of the user's responses matching every word of the query
+    (as prefixes), best matches first. Files being deleted are left out.
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return []
+
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        rows = db.session.execute(
+            text(f"SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} "
+                 f"JOIN response ON response.id = {FTS_TABLE}.rowid "
+                 "JOIN csv_file ON csv_file.id = response.csv_file_id "
+                 f"WHERE {FTS_TABLE} MATCH :match AND csv_file.user_id = :user_id "
+                 "AND csv_file.status != 'deleting' "
+                 f"ORDER BY {FTS_TABLE}.rank LIMIT :limit OFFSET :offset"),
+            {"match": match, "user_id": user_id,
+             "limit": limit, "offset": offset})
+        return [row[0] for row in rows]
+
+    if dialect == 'postgresql':
+        document = _pg_document()
+        ts_query = func.to_tsquery(literal_column("'simple'::regconfig"),
+                                   ' & '.join(f'{term}:*' for term in terms))
+        condition = document.op('@@')(ts_query)
+        order = func.ts_rank(document, ts_query).desc()
+    else:
+        # No full-text support: substring match on every term
+        condition = and_(*[
+            or_(*[getattr(Response, name).ilike(f'%{term}%')
+                     for name in SEARCH_COLUMNS]) for term in terms
+        ])
+        order = Response.id
+
+    return list(db.session.scalars(
+        select(Response.id).join(CSVFile)
+        .where(CSVFile.user_id == user_id, CSVFile.status != 'deleting',
+               condition)
+        .order_by(order, Response.id)
+        .limit(limit).offset(offset)))
@@ -1,9 +1,136 @@
 document.addEventListener('DOMContentLoaded', function() {
-    // Initialize tooltips
-    const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
-    const tooltipList = tooltipTriggerList.map(function (tooltipTriggerEl) {
-        return new bootstrap.Tooltip(tooltipTriggerEl);
-    });
+    // Tooltips are initialized by main.js, which every page loads
+
+    // Assessment view: prefetch the next unassessed responses and swap them in
+    // when the current one is submitted, instead of loading a new page
+    const assessmentForm = document.getElementById('assessment-form');
+    if (assessmentForm && assessmentForm.dataset.itemsUrl) {
+        window.assessmentView = createAssessmentView(assessmentForm);
+        window.assessmentView.prefetch();
+        window.addEventListener('popstate', () => window.location.reload());
+    }
+
+    function createAssessmentView(form) {
+        const size = parseInt(form.dataset.prefetchSize, 10) || 5;
+        const buffer = [];
+        let loading = null;
+        let exhausted = false;
+
+        const lastId = () => buffer.length
+            ? buffer[buffer.length - 1].id
+            : parseInt(form.dataset.responseId, 10);
+
+        const view = {
+            prefetchRequest: () => ({after_id: lastId(), limit: size}),
+
+            // Append items fetched after request.after_id; fewer than
+            // requested means there are none left after them
+            addItems(items, request) {
+                if (request.after_id !== lastId()) {
+                    return;
+                }
+                buffer.push(...items);
+                exhausted = items.length < request.limit;
+            },
+
+            prefetch() {
+                if (loading || exhausted || buffer.length >= size) {
+                    return loading || Promise.resolve();
+                }
+                const request = view.prefetchRequest();
+                // The URLs may already carry the page's timeframe filter
+                const url = new URL(form.dataset.itemsUrl, window.location.href);
+                url.searchParams.set('after_id', request.after_id);
+                url.searchParams.set('limit', request.limit);
+                loading = fetch(url, {credentials: 'same-origin'})
+                    .then(response => {
+                        if (!response.ok) {
+                            throw new Error('Prefetch failed with status ' + response.status);
+                        }
+                        return response.json();
+                    })
+                    .then(data => view.addItems(data.items, request))
+                    .catch(error => console.error('Error prefetching responses:', error))
+                    .finally(() => {
+                        loading = null;
+                    });
+                return loading;
+            },
+
+            // Show the next prefetched response; resolves to false if there
+            // is none, so the caller falls back to loading a page
+            showNext() {
+                const next = buffer.length ? Promise.resolve() : (loading || Promise.resolve());
+                return next.then(() => {
+                    const item = buffer.shift();
+                    if (!item) {
+                        return false;
+                    }
+                    render(item);
+                    view.prefetch();
+                    return true;
+                });
+            }
+        };
+
+        function render(item) {
+            document.querySelectorAll('[data-item-field]').forEach(el => {
+                const value = item[el.dataset.itemField];
+                el.textContent = value || el.dataset.empty || '';
+            });
+            document.querySelectorAll('[data-item-block]').forEach(el => {
+                el.classList.toggle('d-none', !item[el.dataset.itemBlock]);
+            });
+            // Prefetched responses are unassessed: pre-select the suggested
+            // scores computed at upload time, if any
+            const suggested = item.suggested || {};
+            form.querySelectorAll('input[type="radio"]').forEach(input => {
+                const value = suggested[input.name.replace(/^score_/, '')];
+                input.checked = value !== null && value !== undefined
+                    && parseFloat(input.value) === value;
+            });
+            document.querySelectorAll('[data-suggested-badge]').forEach(el => {
+                const value = suggested[el.dataset.suggestedBadge];
+                el.classList.toggle('d-none', value === null || value === undefined);
+            });
+
+            // Prefetched responses are unassessed, so submitting the one shown
+            // until now added to the count unless it had been assessed before
+            if (form.dataset.assessed !== 'true') {
+                document.querySelectorAll('.assessment-assessed-count').forEach(el => {
+                    el.textContent = parseInt(el.textContent, 10) + 1;
+                });
+                const progressBar = document.querySelector('.assessment-progress-bar');
+                if (progressBar) {
+                    const assessed = parseInt(progressBar.getAttribute('aria-valuenow'), 10) + 1;
+                    const total = parseInt(progressBar.getAttribute('aria-valuemax'), 10);
+                    progressBar.setAttribute('aria-valuenow', assessed);
+                    progressBar.style.width = `${total ? assessed / total * 100 : 0}%`;
+                }
+            }
+            document.querySelectorAll('.assessment-position').forEach(el => {
+                el.textContent = item.position;
+            });
+
+            form.dataset.responseId = item.id;
+            form.dataset.assessed = 'false';
+            form.dataset.nextId = '';
+            form.action = form.action.replace(/\/\d+(?=\?|$)/, '/' + item.id);
+            const nextInput = document.getElementById('next_response_input');
+            if (nextInput) {
+                nextInput.value = '';
+            }
+            document.querySelectorAll('.btn-next').forEach(button => {
+                button.dataset.responseId = '';
+            });
+            const pageUrl = new URL(form.dataset.assessmentUrl, window.location.href);
+            pageUrl.searchParams.set('response_id', item.id);
+            history.pushState({responseId: item.id}, '', pageUrl);
+            window.scrollTo(0, 0);
+        }
+
+        return view;
+    }
 
     // Export results button
     const exportBtn = document.getElementById('exportBtn');
@@ -93,6 +93,29 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Poll ingestion progress of uploads that are still being processed
+    const uploadStatuses = document.querySelectorAll('.upload-status');
+    uploadStatuses.forEach(status => {
+        const poll = function() {
+            fetch(status.dataset.statusUrl)
+                .then(response => response.json())
+                .then(data => {
+                    if (data.status !== 'processing') {
+                        window.location.reload();
+                        return;
+                    }
+                    status.querySelector('.upload-status-rows').textContent = data.rows_ingested;
+                    status.querySelector('.upload-status-rate').textContent = data.rows_per_second;
+                    setTimeout(poll, 2000);
+                })
+                .catch(error => {
+                    console.error('Error polling upload status:', error);
+                    setTimeout(poll, 10000);
+                });
+        };
+        poll();
+    });
+
     // Display confirmation before deleting
     const deleteButtons = document.querySelectorAll('.btn-delete');
     deleteButtons.forEach(button => {
@@ -0,0 +1,172 @@
+// Queue assessments in localStorage and submit them to the server in batches,
+// so annotators move to the next response without a form round trip and
+// nothing is lost while offline
+class AssessmentQueue {
+    constructor(form) {
+        this.form = form;
+        this.url = form.dataset.batchUrl;
+        this.batchSize = parseInt(form.dataset.batchSize, 10) || 10;
+        this.batchMax = parseInt(form.dataset.batchMax, 10) || 500;
+        this.key = 'assessment-queue:' + form.dataset.fileId;
+        this.csrfToken = form.querySelector('input[name="csrf_token"]').value;
+        this.flushing = null;
+    }
+
+    load() {
+        try {
+            return JSON.parse(localStorage.getItem(this.key)) || [];
+        } catch (error) {
+            return [];
+        }
+    }
+
+    save(items) {
+        if (items.length) {
+            localStorage.setItem(this.key, JSON.stringify(items));
+        } else {
+            localStorage.removeItem(this.key);
+        }
+        document.querySelectorAll('.assessment-queue-count').forEach(el => {
+            el.textContent = items.length;
+            el.closest('.assessment-queue-status').classList.toggle('d-none', !items.length);
+        });
+    }
+
+    // Add or replace the queued assessment of a response
+    add(assessment) {
+        assessment.queued_at = Date.now();
+        const items = this.load().filter(item => item.response_id !== assessment.response_id);
+        items.push(assessment);
+        this.save(items);
+        return items.length;
+    }
+
+    // Send queued assessments, keeping those the server did not answer for
+    flush(keepalive = false) {
+        if (this.flushing) {
+            return this.flushing;
+        }
+        const batch = this.load().slice(0, this.batchMax);
+        if (!batch.length) {
+            return Promise.resolve(true);
+        }
+        // Ask for the items after those the assessment view already holds
+        const view = window.assessmentView;
+        const body = {assessments: batch};
+        if (view) {
+            body.prefetch = view.prefetchRequest();
+        }
+        this.flushing = fetch(this.url, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': this.csrfToken},
+            body: JSON.stringify(body),
+            credentials: 'same-origin',
+            keepalive: keepalive
+        })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Batch submission failed with status ' + response.status);
+                }
+                return response.json();
+            })
+            .then(data => {
+                // Results are in batch order; drop every item that was answered
+                // unless it was queued again while the request was in flight
+                const sent = new Map(batch.map(item => [item.response_id, item.queued_at]));
+                data.results.forEach(result => {
+                    if (result.status === 'error') {
+                        console.warn('Assessment of response', result.response_id, 'rejected:', result.error);
+                    }
+                });
+                this.save(this.load().filter(item => sent.get(item.response_id) !== item.queued_at));
+                if (view && data.items) {
+                    view.addItems(data.items, body.prefetch);
+                }
+                return true;
+            })
+            .catch(error => {
+                console.error('Error submitting queued assessments:', error);
+                return false;
+            })
+            .finally(() => {
+                this.flushing = null;
+            });
+        return this.flushing;
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('assessment-form');
+    if (!form || !form.dataset.batchUrl || !window.localStorage) {
+        return;
+    }
+    const queue = new AssessmentQueue(form);
+    let leavingForQueuedItem = false;
+
+    // Submit anything left over from earlier pages
+    queue.save(queue.load());
+    queue.flush();
+
+    form.addEventListener('submit', function(e) {
+        const assessment = {response_id: parseInt(form.dataset.responseId, 10)};
+        for (const name of ['score_period_string', 'score_period_timeframe',
+                            'score_location_string', 'score_location_qid']) {
+            const checked = form.querySelector('input[name="' + name + '"]:checked');
+            if (!checked) {
+                // Let the server report the missing score
+                return;
+            }
+            assessment[name] = parseFloat(checked.value);
+        }
+
+        const nextInput = document.getElementById('next_response_input');
+        const nextId = (nextInput && nextInput.value) || form.dataset.nextId;
+        e.preventDefault();
+        const pending = queue.add(assessment);
+
+        const showNext = window.assessmentView
+            ? window.assessmentView.showNext()
+            : Promise.resolve(false);
+        showNext.then(shown => {
+            if (shown) {
+                // The next response was swapped in without a page load
+                if (pending >= queue.batchSize) {
+                    queue.flush();
+                }
+                return;
+            }
+
+            if (!nextId) {
+                // Last response: save everything before going back to the dashboard
+                queue.flush().then(saved => {
+                    if (saved && !queue.load().length) {
+                        window.location.assign(form.dataset.doneUrl);
+                    } else {
+                        form.submit();
+                    }
+                });
+                return;
+            }
+
+            const next = function() {
+                leavingForQueuedItem = true;
+                const url = new URL(form.dataset.assessmentUrl, window.location.href);
+                url.searchParams.set('response_id', nextId);
+                window.location.assign(url);
+            };
+            if (pending >= queue.batchSize) {
+                queue.flush().then(next);
+            } else {
+                next();
+            }
+        });
+    });
+
+    window.addEventListener('online', () => queue.flush());
+    window.addEventListener('pagehide', function() {
+        // Leaving the assessment pages: send what is queued
+        if (!leavingForQueuedItem) {
+            queue.flush(true);
+        }
+    });
+});
@@ -0,0 +1,64 @@
+import os
+import sys
+
+# Run against a throwaway in-memory database, whose schema is created below
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402  (must be imported before the other modules)
+from migrations import upgrade_schema  # noqa: E402
+
+with app.app_context():
+    upgrade_schema()
+
+import io  # noqa: E402
+
+import pytest  # noqa: E402
+from werkzeug.datastructures import FileStorage  # noqa: E402
+
+import main  # noqa: E402,F401  (registers the routes and instrumentation)
+from app import db  # noqa: E402
+from models import CSVFile, User  # noqa: E402
+from utils import process_csv  # noqa: E402
+
+USERNAME = "annotator"
+PASSWORD = "annotator-password"
+
+UPLOAD = (
+    "response_id\tmodel_name\tgt_timeframe\tpred_timeframe\tscore_period_string\n"
+    "resp_1\tllama\t1630-1650\t1630-1650\t1\n"
+    "resp_2\tllama\t1630\t1700-1720\t0.5\n"
+    "resp_3\tmistral\t\t1640\t\n"
+)
+
+
+@pytest.fixture(scope="session")
+def user_id():
+    with app.app_context():
+        user = User(username=USERNAME, email="annotator@example.com")
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def client(user_id):
+    app.config["WTF_CSRF_ENABLED"] = False
+    client = app.test_client()
+    client.post("/login", data={"username": USERNAME, "password": PASSWORD})
+    return client
+
+
+@pytest.fixture
+def csv_file_id(user_id):
+    """
+    A small file uploaded by the test user, ingested synchronously
+    """
+    with app.app_context():
+        success, message = process_csv(
+            FileStorage(io.BytesIO(UPLOAD.encode()), "run.tsv"), user_id)
+        assert success, message
+        return db.session.scalar(
+            db.select(CSVFile.id).where(CSVFile.user_id == user_id)
+            .order_by(CSVFile.id.desc()))
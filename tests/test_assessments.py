@@ -0,0 +1,67 @@
+import pytest
+
+import routes
+import utils
+from app import app, db
+from models import Assessment, Response
+
+SCORES = {'score_period_string': '1', 'score_period_timeframe': '0.5',
+          'score_location_string': '0', 'score_location_qid': '1'}
+
+
+@pytest.fixture
+def response_id(csv_file_id):
+    with app.app_context():
+        return db.session.scalar(
+            db.select(Response.id).where(Response.csv_file_id == csv_file_id)
+            .order_by(Response.id))
+
+
+def saved_concurrently(record, user_id, response_id):
+    """
+    Wrap a record_* helper so that the same assessment is added once more
+    before it runs, as if another request had saved it in the meantime
+    """
+    def wrapper(*args, **kwargs):
+        db.session.add(Assessment(response_id=response_id, user_id=user_id))
+        return record(*args, **kwargs)
+    return wrapper
+
+
+def assessment_count(response_id):
+    with app.app_context():
+        return db.session.scalar(
+            db.select(db.func.count(Assessment.id))
+            .where(Assessment.response_id == response_id))
+
+
+def test_concurrent_batch_save_is_a_conflict(client, user_id, response_id,
+                                             csv_file_id, monkeypatch):
+    monkeypatch.setattr(utils, 'record_score_changes', saved_concurrently(
+        utils.record_score_changes, user_id, response_id))
+    item = {'response_id': response_id,
+            **{name: float(value) for name, value in SCORES.items()}}
+    response = client.post(f'/submit_assessments/{csv_file_id}',
+                           json={'assessments': [item]})
+    assert response.status_code == 409
+    assert assessment_count(response_id) == 0
+
+
+def test_concurrent_form_submit_is_reported(client, user_id, response_id,
+                                            csv_file_id, monkeypatch):
+    monkeypatch.setattr(routes, 'record_scores', saved_concurrently(
+        routes.record_scores, user_id, response_id))
+    response = client.post(
+        f'/submit_assessment/{csv_file_id}/{response_id}', data=SCORES)
+    assert response.status_code == 302
+    assert f'response_id={response_id}' in response.headers['Location']
+    with client.session_transaction() as session:
+        assert session['_flashes'][-1][0] == 'warning'
+    assert assessment_count(response_id) == 0
+
+
+def test_form_submit_saves_the_assessment(client, response_id, csv_file_id):
+    response = client.post(
+        f'/submit_assessment/{csv_file_id}/{response_id}', data=SCORES)
+    assert response.status_code == 302
+    assert assessment_count(response_id) == 1
@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from autoscore import SUGGESTION_COLUMNS, suggest_scores
+from timeframes import parse_timeframes
+
+
+def timeframe_suggestion(gt, pred):
+    frame = pd.DataFrame({'gt_timeframe': [gt], 'pred_timeframe': [pred]})
+    frame = frame.join(parse_timeframes(frame))
+    score = suggest_scores(frame)[SUGGESTION_COLUMNS['period_timeframe']].iloc[0]
+    return None if pd.isna(score) else score
+
+
+@pytest.mark.parametrize('gt, pred, expected', [
+    ('1630-1650', '1630 - 1650', 1.0),
+    ('between 1630 and 1650', '1630-50', 1.0),
+    ('1630-1650', '1640-1660', 0.5),
+    ('1630-1650', '1700-1720', 0.0),
+])
+def test_explicit_intervals_are_scored(gt, pred, expected):
+    assert timeframe_suggestion(gt, pred) == expected
+
+
+@pytest.mark.parametrize('gt, pred', [
+    ('after 1630', '1640-1650'),
+    ('1600s', '1650-1660'),
+    ('before 1650', '1600-1620'),
+    ('1630-1650', 'c. 1640'),
+    ('17th century', '17th century'),
+    ('1630-1650', ''),
+])
+def test_vague_or_missing_intervals_get_no_suggestion(gt, pred):
+    assert timeframe_suggestion(gt, pred) is None
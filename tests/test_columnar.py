@@ -0,0 +1,51 @@
+import io
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app import app, db
+from models import CSVFile, Response
+from utils import iter_export, process_csv
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def upload_parquet(table, user_id):
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    success, message = process_csv(
+        FileStorage(io.BytesIO(buffer.getvalue()), 'run.parquet'), user_id)
+    assert success, message
+    return db.session.scalar(
+        db.select(CSVFile.id).where(CSVFile.user_id == user_id)
+        .order_by(CSVFile.id.desc()))
+
+
+def test_parquet_round_trip_keeps_types(user_id):
+    table = pa.table({
+        'response_id': pa.array([101, None, 103], pa.int64()),
+        'gt_timeframe': pa.array([1630, None, 1700], pa.int64()),
+        'pred_timeframe': pa.array(['1630-1650', '1640', None]),
+        'document_length': pa.array([12000, None, 30000], pa.int64()),
+        'score_period_string': pa.array([0.5, None, 1.0]),
+    })
+    with app.app_context():
+        csv_file_id = upload_parquet(table, user_id)
+        responses = db.session.scalars(
+            db.select(Response).where(Response.csv_file_id == csv_file_id)
+            .order_by(Response.id)).all()
+        assert [r.response_id for r in responses][::2] == ['101', '103']
+        assert [r.gt_timeframe for r in responses] == ['1630', None, '1700']
+        assert [r.gt_timeframe_status for r in responses] == [
+            'parsed', 'missing', 'parsed']
+
+        exported = pq.read_table(io.BytesIO(b''.join(
+            iter_export(user_id, csv_file_id, 'parquet'))))
+    assert exported.schema.field('score_period_string').type == pa.float64()
+    assert exported.schema.field('document_length').type == pa.int64()
+    rows = exported.select(['response_id', 'gt_timeframe',
+                            'score_period_string']).to_pylist()
+    assert rows[0] == {'response_id': '101', 'gt_timeframe': '1630',
+                       'score_period_string': 0.5}
+    assert rows[1]['score_period_string'] is None
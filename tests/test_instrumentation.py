@@ -0,0 +1,14 @@
+from metrics import REQUESTS_IN_FLIGHT
+
+
+def test_streamed_export_leaves_no_request_in_flight(client, csv_file_id):
+    response = client.post(f"/export/{csv_file_id}", data={"format": "tsv"})
+    assert response.status_code == 200
+    assert "resp_2" in response.get_data(as_text=True)
+    response.close()
+    assert REQUESTS_IN_FLIGHT.values.get((), 0) == 0
+
+
+def test_page_leaves_no_request_in_flight(client, csv_file_id):
+    assert client.get(f"/assessment/{csv_file_id}").status_code == 200
+    assert REQUESTS_IN_FLIGHT.values.get((), 0) == 0
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from timeframes import parse_timeframe
+
+
+def parse(text):
+    row = parse_timeframe(pd.Series([text])).iloc[0]
+    start = None if pd.isna(row['start']) else int(row['start'])
+    end = None if pd.isna(row['end']) else int(row['end'])
+    return start, end, row['status']
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1630-1650', (1630, 1650, 'parsed')),
+    ('1630 – 1650', (1630, 1650, 'parsed')),
+    ('1630-50', (1630, 1650, 'parsed')),
+    ('1630 to 1650', (1630, 1650, 'parsed')),
+    ('from 1630 to 1650', (1630, 1650, 'parsed')),
+    ('between 1630 and 1650', (1630, 1650, 'parsed')),
+    ('1630', (1630, 1630, 'parsed')),
+    ('570-580', (570, 580, 'parsed')),
+])
+def test_explicit_years_are_parsed(text, expected):
+    assert parse(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    'after 1630',
+    'before 1650',
+    '1600s',
+    'early 1630s',
+    'late 1640s',
+    'c. 1630',
+    'circa 1630-1650',
+    'ca. 1630',
+    '17th century',
+    '1650-1630',
+    '-340--320',
+])
+def test_qualified_or_vague_text_is_invalid(text):
+    assert parse(text) == (None, None, 'invalid')
+
+
+@pytest.mark.parametrize('text', ['', '   ', None])
+def test_empty_text_is_missing(text):
+    assert parse(text) == (None, None, 'missing')
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, bindparam, or_, select, update
+
+from app import app, db
+from models import Response
+
+# Free-text timeframe columns parsed into <name>_start, <name>_end (years)
+# and <name>_status
+TIMEFRAME_FIELDS = ('gt_timeframe', 'pred_timeframe')
+TIMEFRAME_COLUMNS = [f'{field}_{part}' for field in TIMEFRAME_FIELDS
+                     for part in ('start', 'end', 'status')]
+
+# Parse status: 'parsed' when start/end hold years, 'missing' for an empty
+# cell, 'invalid' for text that is not an explicit year or year range
+TIMEFRAME_STATUSES = ('parsed', 'missing', 'invalid')
+
+# Only explicit years are parsed: "1630-1650", "1630 – 1650", "1630-50",
+# "1630 to 1650", "from 1630 to 1650", "between 1630 and 1650", or a lone
+# year "1630" as a one-year interval. Qualified or vague text ("c. 1630",
+# "after 1630", "before 1650", "early 1630s", "1600s", "17th century") is
+# 'invalid' rather than read as exact years.
+RANGE_PATTERN = (r'^(?:(?:from|between)\s+)?(?P<start>\d{3,4})\s*'
+                 r'(?:-|–|—|/|\bto\b|\buntil\b|\band\b)\s*'
+                 r'(?P<end>\d{1,4})$')
+YEAR_PATTERN = r'^(?P<start>\d{3,4})$'
+
+# Prediction/reference overlap categories offered by the queue filter
+OVERLAP_FILTERS = {
+    'exact': 'Same interval',
+    'partial': 'Partial overlap',
+    'none': 'No overlap',
+    'unparsed': 'Not parseable',
+}
+
+
+def parse_timeframe(values):
+    """
+    Parse a Series of free-text timeframes into a DataFrame of start and end
+    years (nullable integers) and a parse status
+    """
+    text = values.where(values.notna(), '').astype(str).str.strip().str.lower()
+    ranges = text.str.extract(RANGE_PATTERN)
+    years = text.str.extract(YEAR_PATTERN)
+    start = pd.to_numeric(ranges['start'].fillna(years['start']))
+    end = pd.to_numeric(ranges['end'].fillna(years['start']))
+
+    # Abbreviated end years continue the start year: "1630-50" is 1630-1650
+    abbreviated = ranges['end'].str.len() < ranges['start'].str.len()
+    expanded = start - start % 10 ** ranges['end'].str.len() + end
+    end = end.where(~abbreviated.fillna(False), expanded)
+
+    parsed = start.notna() & end.notna() & (start <= end)
+    status = np.select([text == '', parsed], ['missing', 'parsed'], 'invalid')
+    return pd.DataFrame({
+        'start': start.where(parsed).astype('Int64'),
+        'end': end.where(parsed).astype('Int64'),
+        'status': status,
+    }, index=values.index)
+
+
+def parse_timeframes(frame):
+    """
+    Parse the timeframe columns of a DataFrame of responses. Returns a
+    DataFrame of TIMEFRAME_COLUMNS.
+    """
+    columns = {}
+    for field in TIMEFRAME_FIELDS:
+        values = frame[field] if field in frame.columns else pd.Series(
+            None, index=frame.index, dtype=object)
+        parsed = parse_timeframe(values)
+        for part in ('start', 'end', 'status'):
+            columns[f'{field}_{part}'] = parsed[part]
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def backfill_timeframes(batch_size=None):
+    """
+    Parse the timeframes of responses stored before they were parsed at
+    ingest time, in batches of keyset-ordered rows. Returns the number of
+    rows.
+    """
+    batch_size = batch_size or app.config['INGEST_CHUNK_SIZE']
+    statement = update(Response.__table__).where(
+        Response.__table__.c.id == bindparam('b_id'))
+
+    updated, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            select(Response.id, *[getattr(Response, field)
+                                  for field in TIMEFRAME_FIELDS])
+            .where(Response.id > last_id)
+            .order_by(Response.id)
+            .limit(batch_size)).all()
+        if not rows:
+            break
+        frame = pd.DataFrame(rows, columns=['id', *TIMEFRAME_FIELDS])
+        parsed = parse_timeframes(frame).astype(object)
+        parsed = parsed.where(parsed.notna(), None)
+        parsed['b_id'] = frame['id']
+        db.session.execute(statement, parsed.to_dict('records'))
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+    return updated
+
+
+def timeframe_filter(args):
+    """
+    Read the timeframe filter of the assessment queue from request
+    arguments: year_from/year_to bound the reference interval, overlap picks
+    one of OVERLAP_FILTERS. Returns the valid, non-empty values.
+    """
+    queue_filter = {}
+    for name in ('year_from', 'year_to'):
+        value = args.get(name, type=int)
+        if value is not None:
+            queue_filter[name] = value
+    if args.get('overlap') in OVERLAP_FILTERS:
+        queue_filter['overlap'] = args['overlap']
+    return queue_filter
+
+
+def timeframe_conditions(year_from=None, year_to=None, overlap=None):
+    """
+    Build the Response conditions of a timeframe filter: the reference
+    interval lies within [year_from, year_to], and the predicted interval
+    matches, partly overlaps, misses or cannot be compared with it
+    """
+    conditions = []
+    if year_from is not None:
+        conditions.append(Response.gt_timeframe_start >= year_from)
+    if year_to is not None:
+        conditions.append(Response.gt_timeframe_end <= year_to)
+    if overlap is None:
+        return conditions
+
+    both_parsed = and_(Response.gt_timeframe_status == 'parsed',
+                       Response.pred_timeframe_status == 'parsed')
+    same = and_(Response.pred_timeframe_start == Response.gt_timeframe_start,
+                Response.pred_timeframe_end == Response.gt_timeframe_end)
+    overlapping = and_(Response.pred_timeframe_start <= Response.gt_timeframe_end,
+                       Response.pred_timeframe_end >= Response.gt_timeframe_start)
+    if overlap == 'exact':
+        conditions += [both_parsed, same]
+    elif overlap == 'partial':
+        conditions += [both_parsed, overlapping, ~same]
+    elif overlap == 'none':
+        conditions += [both_parsed, ~overlapping]
+    else:
+        conditions.append(or_(Response.gt_timeframe_status != 'parsed',
+                              Response.pred_timeframe_status != 'parsed'))
+    return conditions
@@ -2,11 +2,34 @@ import os
 import pandas as pd
 import csv
 import json
-from io import StringIO
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+from io import StringIO, TextIOWrapper
 from flask import current_app
-from sqlalchemy.exc import SQLAlchemyError
-from app import db
-from models import CSVFile, Response, Assessment
+from sqlalchemy import (and_, delete, exists, func, insert, literal, select,
+                        update)
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from app import app, db
+from autoscore import SUGGESTION_COLUMNS, suggest_scores
+from columnar import (COLUMNAR_EXTENSIONS, COLUMNAR_TYPES, MISSING_PYARROW,
+                      columnar_available, columnar_headers,
+                      iter_columnar_chunks, iter_columnar_export)
+from jobs import submit_job
+from leaderboard import (rebuild_score_summary, record_summary_changes,
+                         remove_file_summary, response_summary_keys)
+from locations import is_qid, location_records, qid_response_ids
+from metrics import UPLOAD_ROWS
+from models import (CSVFile, Response, ResponseLocation, Assessment,
+                    AssessmentProgress, ScoreSummary)
+from progress import (SCORE_FIELDS, get_progress, progress_scores,
+                      rebuild_progress, record_assessed, record_score_changes)
+from search_index import (index_file_responses, remove_file_responses,
+                          search_response_ids)
+from timeframes import parse_timeframes
 
 # CSV validation settings
 REQUIRED_HEADERS = [
@@ -54,354 +77,1234 @@ RECOMMENDED_HEADERS = [
 ]
 
 
+def upload_format(filename):
+    """
+    Determine the file type label and delimiter from the upload's extension.
+    Parquet and Arrow files have no delimiter.
+    """
+    filename = filename.lower()
+    extension = os.path.splitext(filename)[1]
+    if extension in COLUMNAR_EXTENSIONS:
+        return COLUMNAR_EXTENSIONS[extension], None
+    is_tsv = filename.endswith('.tsv') or filename.endswith('.txt')
+    return ('TSV', '\t') if is_tsv else ('CSV', ',')
+
+
+def open_upload(stream, delimiter):
+    """
+    Wrap a binary upload stream in a decoding text stream and read only its
+    header row. Returns (text_stream, headers); the stream is positioned on
+    the first data row so the same pass can feed row ingestion. Call
+    detach() on the text stream when done so the upload is not closed with it.
+    """
+    text_stream = TextIOWrapper(stream,
+                                encoding='utf-8-sig',
+                                newline='')
+    try:
+        headers = next(csv.reader(text_stream, delimiter=delimiter), None)
+    except Exception:
+        text_stream.detach()
+        raise
+    return text_stream, headers
+
+
+def check_headers(headers, file_type):
+    """
+    Validate a header row and report missing recommended columns
+    """
+    if headers is None:
+        return False, f"{file_type} file appears to be empty"
+
+    if not headers:
+        return False, f"{file_type} file has no headers"
+
+    # Check if response_id is present
+    has_response_id = 'response_id' in headers
+
+    # Check which recommended headers are missing
+    missing_recommended = [
+        header for header in RECOMMENDED_HEADERS if header not in headers
+    ]
+
+    success_message = f"{file_type} file is valid"
+
+    # If response_id is missing, inform user IDs will be auto-generated
+    if not has_response_id:
+        success_message += ". Note: 'response_id' column is missing; IDs will be auto-generated."
+
+    # Mention other missing recommended fields
+    other_missing = [h for h in missing_recommended if h != 'response_id']
+    if other_missing:
+        success_message += f" Some recommended columns are missing: {', '.join(other_missing[:5])}"
+        if len(other_missing) > 5:
+            success_message += f" and {len(other_missing) - 5} more"
+
+    return True, success_message
+
+
+def read_upload_headers(source, file_type, delimiter):
+    """
+    Read the column names of an upload: the header row of a CSV/TSV, or the
+    schema of a Parquet/Arrow file
+    """
+    if file_type in COLUMNAR_TYPES:
+        return columnar_headers(source, file_type)
+    text_stream, headers = open_upload(source, delimiter)
+    text_stream.detach()
+    return headers
+
+
 def validate_csv(file_storage):
     """
-    Validate that the uploaded CSV/TSV has valid format
+    Validate that the uploaded CSV/TSV (or Parquet/Arrow file) has valid
+    format, reading only the header row or schema
     """
     try:
-        # Convert the FileStorage to a string buffer
-        stream = StringIO(file_storage.stream.read().decode('utf-8'),
-                          newline=None)
+        file_type, delimiter = upload_format(file_storage.filename)
+        if file_type in COLUMNAR_TYPES and not columnar_available():
+            return False, MISSING_PYARROW
+        headers = read_upload_headers(file_storage.stream, file_type,
+                                      delimiter)
+        return check_headers(headers, file_type)
+    except Exception as e:
+        return False, f"Error validating CSV: {str(e)}"
+    finally:
         file_storage.stream.seek(0)  # Rewind the file pointer for later use
 
-        # Check file extension to determine delimiter
-        filename = file_storage.filename.lower()
-        is_tsv = filename.endswith('.tsv') or filename.endswith('.txt')
-        delimiter = '\t' if is_tsv else ','
 
-        # Try to read the file headers
-        reader = csv.reader(stream, delimiter=delimiter)
-        try:
-            headers = next(reader)
-        except StopIteration:
-            return False, f"{'TSV' if is_tsv else 'CSV'} file appears to be empty"
+def _coalesce_columns(chunk, *names):
+    """
+    Return the first non-null value across the given columns, row by row
+    """
+    result = None
+    for name in names:
+        if name not in chunk.columns:
+            continue
+        result = chunk[name] if result is None else result.fillna(chunk[name])
+    return result
+
+
+def _to_boolean(values):
+    """
+    Coerce a column of booleans or boolean-like strings to True/False/None
+    """
+    if values.dtype == bool:
+        return values
+    mapping = {'true': True, '1': True, 'yes': True, '1.0': True,
+               'false': False, '0': False, 'no': False, '0.0': False}
+    return values.map(lambda v: mapping.get(str(v).strip().lower())
+                      if pd.notna(v) else None)
+
+
+def _response_records(chunk, offset, csv_file_id):
+    """
+    Build the insert parameters for a chunk of uploaded rows, column by column
+    """
+    index = range(offset, offset + len(chunk))
+    chunk = chunk.set_axis(index)
+    records = pd.DataFrame(index=index)
+
+    # Use the existing response_id or generate one if the cell is empty/null
+    auto_ids = pd.Series([f'auto_gen_{idx}' for idx in index], index=index)
+    if 'response_id' in chunk.columns:
+        records['response_id'] = chunk['response_id'].astype(object).where(
+            chunk['response_id'].notna(), auto_ids)
+    else:
+        records['response_id'] = auto_ids
+
+    # Columns copied as-is; renamed columns fall back on their old names
+    # (and vice versa) for backward compatibility
+    sources = {
+        'prompt_id': ('prompt_id',),
+        'model_name': ('model_name', 'model_id'),
+        'model_id': ('model_id', 'model_name'),
+        'document_id': ('document_id',),
+        'author': ('author',),
+        'title': ('title',),
+        'publication_date': ('publication_date',),
+        'document_length': ('document_length',),
+        'keep_fine_tuning': ('keep_fine_tuning',),
+
+        # Time/Period fields
+        'gt_period': ('gt_period',),
+        'pred_period': ('pred_period',),
+        'score_period_string': ('score_period_string',),
+        'gt_timeframe': ('gt_timeframe',),
+        'pred_timeframe': ('pred_timeframe',),
+        'score_period_timeframe': ('score_period_timeframe',),
+        'gt_period_reason': ('gt_period_reason',),
+        'gt_period_reasoning': ('gt_period_reasoning',),
+        'pred_period_reasoning': ('pred_period_reasoning',),
+        'score_period_reasoning': ('score_period_reasoning',),
 
-        if not headers:
-            return False, f"{'TSV' if is_tsv else 'CSV'} file has no headers"
+        # Location fields with new/renamed columns
+        'gt_preferred_location': ('gt_preferred_location', 'gt_location'),
+        'gt_accepted_locations': ('gt_accepted_locations',),
+        'gt_preferred_location_QID': ('gt_preferred_location_QID', 'gt_location_QID'),
+        'gt_acceptable_location_QIDs': ('gt_acceptable_location_QIDs',),
+        'gt_location': ('gt_location', 'gt_preferred_location'),
+        'gt_location_QID': ('gt_location_QID', 'gt_preferred_location_QID'),
 
-        # Check if response_id is present
-        has_response_id = 'response_id' in headers
+        # Unchanged fields
+        'pred_location': ('pred_location',),
+        'score_location_string': ('score_location_string',),
+        'pred_location_qid': ('pred_location_qid',),
+        'score_location_qid': ('score_location_qid',),
+        'gt_location_reason': ('gt_location_reason',),
+        'pred_location_reasoning': ('pred_location_reasoning',),
+        'score_location_reasoning': ('score_location_reasoning',),
+    }
+    for column, names in sources.items():
+        values = _coalesce_columns(chunk, *names)
+        records[column] = values if values is not None else None
+
+    records['document_length'] = pd.to_numeric(
+        records['document_length'], errors='coerce').astype('Int64')
+    records['keep_fine_tuning'] = _to_boolean(records['keep_fine_tuning'])
+    records['csv_file_id'] = csv_file_id
+    records['position'] = range(offset + 1, offset + len(chunk) + 1)
+
+    # Parsed timeframe years, then the scores that can be decided
+    # mechanically, computed for the whole chunk
+    records = records.join(parse_timeframes(records))
+    records = records.join(suggest_scores(records))
 
-        # Check which recommended headers are missing
-        missing_recommended = [
-            header for header in RECOMMENDED_HEADERS if header not in headers
-        ]
+    # Convert to plain Python values with NULLs for missing cells
+    records = records.astype(object)
+    return records.where(records.notna(), None).to_dict('records')
 
-        # Determine file type for messages
-        file_type = 'TSV' if is_tsv else 'CSV'
 
-        success_message = f"{file_type} file is valid"
+def ingest_chunks(csv_file, chunks):
+    """
+    Insert rows from an iterable of DataFrame chunks with set-based inserts,
+    committing every INGEST_COMMIT_ROWS rows. The ground-truth locations and
+    QIDs of each chunk go to ResponseLocation, keyed by the ids the response
+    insert returns. Returns (rows, seconds).
+    """
+    commit_rows = current_app.config['INGEST_COMMIT_ROWS']
+    csv_file_id = csv_file.id
+    insert_responses = Response.__table__.insert().returning(
+        Response.__table__.c.id, sort_by_parameter_order=True)
+    insert_locations = ResponseLocation.__table__.insert()
+
+    started = time.perf_counter()
+    ingested = 0
+    pending = 0
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        records = _response_records(chunk, ingested, csv_file_id)
+        response_ids = db.session.execute(insert_responses, records).scalars().all()
+        locations = location_records(pd.DataFrame(records), response_ids)
+        if locations:
+            db.session.execute(insert_locations, locations)
+        UPLOAD_ROWS.inc(amount=len(records))
+        ingested += len(records)
+        pending += len(records)
 
-        # If response_id is missing, inform user IDs will be auto-generated
-        if not has_response_id:
-            success_message += ". Note: 'response_id' column is missing; IDs will be auto-generated."
+        if pending >= commit_rows:
+            csv_file.total_responses = ingested
+            db.session.commit()
+            pending = 0
 
-        # Mention other missing recommended fields
-        other_missing = [h for h in missing_recommended if h != 'response_id']
-        if other_missing:
-            success_message += f" Some recommended columns are missing: {', '.join(other_missing[:5])}"
-            if len(other_missing) > 5:
-                success_message += f" and {len(other_missing) - 5} more"
+    csv_file.total_responses = ingested
+    db.session.commit()
+    return ingested, time.perf_counter() - started
 
-        return True, success_message
+
+def _discard_partial_upload(csv_file_id, keep_file=False):
+    """
+    Remove the rows already committed for an upload that failed part-way
+    """
+    try:
+        remove_file_responses(csv_file_id)
+        remove_file_summary(csv_file_id)
+        db.session.execute(
+            delete(ResponseLocation).where(ResponseLocation.response_id.in_(
+                select(Response.id).where(Response.csv_file_id == csv_file_id))))
+        db.session.execute(
+            delete(Response).where(Response.csv_file_id == csv_file_id))
+        if not keep_file:
+            db.session.execute(
+                delete(CSVFile).where(CSVFile.id == csv_file_id))
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error discarding partial upload: {str(e)}")
+
+
+def _ingest_text_stream(csv_file, text_stream, headers, delimiter):
+    """
+    Parse the remainder of an upload in chunks, insert its rows and mark the
+    file as ready. Returns (rows ingested, rows per second).
+    """
+    chunks = pd.read_csv(text_stream,
+                         delimiter=delimiter,
+                         header=None,
+                         names=headers,
+                         chunksize=current_app.config['INGEST_CHUNK_SIZE'])
+    return _ingest_and_finish(csv_file, chunks)
+
+
+def _ingest_columnar(csv_file, source, file_type):
+    """
+    Read a Parquet/Arrow upload batch by batch, insert its rows and mark the
+    file as ready; no text is parsed. Returns (rows ingested, rows per second).
+    """
+    chunks = iter_columnar_chunks(source, file_type,
+                                  current_app.config['INGEST_CHUNK_SIZE'])
+    return _ingest_and_finish(csv_file, chunks)
+
+
+def _ingest_and_finish(csv_file, chunks):
+    """
+    Insert rows from DataFrame chunks, then index the file and mark it as
+    ready. Returns (rows ingested, rows per second).
+    """
+    ingested, elapsed = ingest_chunks(csv_file, chunks)
+
+    # Index the file for search and add it to the leaderboard in the same
+    # transaction that marks it ready
+    index_file_responses(csv_file.id)
+    rebuild_score_summary(csv_file.id)
+    csv_file.status = 'ready'
+    csv_file.processed_at = datetime.utcnow()
+    db.session.commit()
+
+    rate = ingested / elapsed if elapsed > 0 else ingested
+    current_app.logger.info(
+        f"Ingested {ingested} responses into file {csv_file.id} "
+        f"in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    return ingested, rate
+
+
+def _mark_upload_failed(csv_file_id, error):
+    """
+    Remove the rows of a failed background upload and record the error
+    """
+    _discard_partial_upload(csv_file_id, keep_file=True)
+    csv_file = db.session.get(CSVFile, csv_file_id)
+    if csv_file is None:
+        return
+    csv_file.status = 'failed'
+    csv_file.error_message = error
+    csv_file.total_responses = 0
+    csv_file.processed_at = datetime.utcnow()
+    db.session.commit()
+
+
+# Name prefix of the temporary files uploads are spooled to
+SPOOL_PREFIX = 'llm_assessment_upload_'
+
+
+def recover_interrupted_uploads():
+    """
+    Clean up after ingestion jobs cut short by a crash or restart: files
+    still 'processing' are marked failed with their partial rows removed,
+    and leftover spool files are deleted. Run once at startup, before any
+    worker starts: files 'processing' in a live worker would be killed too.
+    Returns the number of files marked failed.
+    """
+    file_ids = db.session.scalars(
+        select(CSVFile.id).where(CSVFile.status == 'processing')).all()
+    for csv_file_id in file_ids:
+        current_app.logger.warning(
+            f"Upload of file {csv_file_id} was interrupted, marking it failed")
+        _mark_upload_failed(csv_file_id,
+                            "The upload was interrupted by a server restart")
+
+    spool_dir = tempfile.gettempdir()
+    for name in os.listdir(spool_dir):
+        if name.startswith(SPOOL_PREFIX):
+            try:
+                os.remove(os.path.join(spool_dir, name))
+            except OSError as e:
+                current_app.logger.error(f"Error removing spool file {name}: {str(e)}")
+    return len(file_ids)
+
+
+def start_ingest_job(file_storage, user_id):
+    """
+    Spool an upload to a temporary file, validate its header row (or
+    Parquet/Arrow schema) and queue a background job that ingests it. The
+    CSVFile is created in the 'processing' state so the dashboard can poll
+    its progress.
+    """
+    file_type, delimiter = upload_format(file_storage.filename)
+    if file_type in COLUMNAR_TYPES and not columnar_available():
+        return False, MISSING_PYARROW
+    suffix = os.path.splitext(file_storage.filename)[1]
+    fd, path = tempfile.mkstemp(prefix=SPOOL_PREFIX, suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            shutil.copyfileobj(file_storage.stream, spool)
+
+        with open(path, 'rb') as stream:
+            headers = read_upload_headers(stream, file_type, delimiter)
+
+        is_valid, message = check_headers(headers, file_type)
+        if not is_valid:
+            os.remove(path)
+            return False, message
+
+        csv_file = CSVFile(filename=file_storage.filename,
+                           user_id=user_id,
+                           total_responses=0,
+                           status='processing')
+        db.session.add(csv_file)
+        db.session.commit()
     except Exception as e:
+        db.session.rollback()
+        if os.path.exists(path):
+            os.remove(path)
+        current_app.logger.error(f"Error queuing upload: {str(e)}")
         return False, f"Error validating CSV: {str(e)}"
 
+    submit_job(run_ingest_job, csv_file.id, path, file_type, delimiter)
+    return True, f"{file_type} file \"{file_storage.filename}\" is being processed"
 
-def process_csv(file_storage, user_id):
+
+def run_ingest_job(csv_file_id, path, file_type, delimiter):
     """
-    Process and save CSV file data to the database
+    Background job: ingest a spooled upload into an existing CSVFile record
     """
     try:
-        # Validate CSV
-        is_valid, message = validate_csv(file_storage)
-        if not is_valid:
+        csv_file = db.session.get(CSVFile, csv_file_id)
+        if csv_file is None:
+            return
+        if file_type in COLUMNAR_TYPES:
+            _ingest_columnar(csv_file, path, file_type)
+            return
+        with open(path, 'rb') as stream:
+            text_stream, headers = open_upload(stream, delimiter)
+            try:
+                _ingest_text_stream(csv_file, text_stream, headers, delimiter)
+            finally:
+                text_stream.detach()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error processing file {csv_file_id}: {str(e)}")
+        _mark_upload_failed(csv_file_id, str(e))
+    finally:
+        os.remove(path)
+
+
+def delete_file_data(csv_file_id):
+    """
+    Delete a file with its responses, assessments, locations, progress
+    records, leaderboard summary and search index entries, using one
+    set-based statement per table in a single transaction. Returns
+    (success, message).
+    """
+    in_file = select(Response.id).where(Response.csv_file_id == csv_file_id)
+    try:
+        remove_file_responses(csv_file_id)
+        for statement in (
+                delete(Assessment).where(Assessment.response_id.in_(in_file)),
+                delete(ResponseLocation).where(
+                    ResponseLocation.response_id.in_(in_file)),
+                delete(ScoreSummary).where(
+                    ScoreSummary.csv_file_id == csv_file_id),
+                delete(Response).where(Response.csv_file_id == csv_file_id),
+                delete(AssessmentProgress).where(
+                    AssessmentProgress.csv_file_id == csv_file_id),
+                delete(CSVFile).where(CSVFile.id == csv_file_id)):
+            db.session.execute(
+                statement.execution_options(synchronize_session=False))
+        db.session.commit()
+        return True, "File deleted successfully"
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error deleting file {csv_file_id}: {str(e)}")
+        return False, f"Error deleting file: {str(e)}"
+
+
+def start_delete_job(csv_file):
+    """
+    Delete a file, in a background job if it has more responses than
+    DELETE_JOB_THRESHOLD. The file is marked 'deleting' first so it leaves
+    the dashboard straight away. Returns (success, message).
+    """
+    filename = csv_file.filename
+    if csv_file.total_responses <= current_app.config['DELETE_JOB_THRESHOLD']:
+        success, message = delete_file_data(csv_file.id)
+        if not success:
             return False, message
+        return True, f'Job "{filename}" and all associated data deleted successfully.'
+
+    csv_file.status = 'deleting'
+    db.session.commit()
+    submit_job(run_delete_job, csv_file.id)
+    return True, f'Job "{filename}" is being deleted.'
+
 
-        # Check file extension to determine delimiter
-        filename = file_storage.filename.lower()
-        is_tsv = filename.endswith('.tsv') or filename.endswith('.txt')
-        delimiter = '\t' if is_tsv else ','
+def run_delete_job(csv_file_id):
+    """
+    Background job: delete a file marked 'deleting'. If that fails nothing
+    was removed, so the file is listed again.
+    """
+    success, message = delete_file_data(csv_file_id)
+    if not success:
+        csv_file = db.session.get(CSVFile, csv_file_id)
+        if csv_file is not None:
+            csv_file.status = 'ready'
+            db.session.commit()
+
+
+def resume_deletions():
+    """
+    Finish the deletion of files left 'deleting' by a crash or restart. Run
+    once at startup, before any worker serves requests; the deletions run
+    inline so no pool thread is started in the process that forks the
+    workers. Returns the number of files handled.
+    """
+    file_ids = db.session.scalars(
+        select(CSVFile.id).where(CSVFile.status == 'deleting')).all()
+    for csv_file_id in file_ids:
+        current_app.logger.warning(
+            f"Deletion of file {csv_file_id} was interrupted, resuming it")
+        run_delete_job(csv_file_id)
+    return len(file_ids)
 
-        # Reset file pointer and read with pandas using appropriate delimiter
-        file_storage.stream.seek(0)
-        df = pd.read_csv(file_storage.stream, delimiter=delimiter)
+
+def get_ingest_status(csv_file):
+    """
+    Summarise the ingestion progress of a file for the status endpoint
+    """
+    finished_at = csv_file.processed_at or datetime.utcnow()
+    elapsed = max((finished_at - csv_file.upload_date).total_seconds(), 0)
+    rows = csv_file.total_responses or 0
+    return {
+        "id": csv_file.id,
+        "filename": csv_file.filename,
+        "status": csv_file.status,
+        "rows_ingested": rows,
+        "elapsed_seconds": round(elapsed, 2),
+        "rows_per_second": round(rows / elapsed) if elapsed > 0 else rows,
+        "error": csv_file.error_message
+    }
+
+
+def process_csv(file_storage, user_id):
+    """
+    Process and save CSV file data to the database in fixed-size chunks
+    """
+    csv_file_id = None
+    text_stream = None
+    try:
+        # Read and validate the header row, then parse the rest of the
+        # same stream in chunks without rewinding (Parquet/Arrow: read the
+        # schema, then the batches from the start)
+        file_type, delimiter = upload_format(file_storage.filename)
+        if file_type in COLUMNAR_TYPES and not columnar_available():
+            return False, MISSING_PYARROW
+        try:
+            if file_type in COLUMNAR_TYPES:
+                headers = columnar_headers(file_storage.stream, file_type)
+                file_storage.stream.seek(0)
+            else:
+                text_stream, headers = open_upload(file_storage.stream,
+                                                   delimiter)
+        except Exception as e:
+            return False, f"Error validating CSV: {str(e)}"
+
+        is_valid, message = check_headers(headers, file_type)
+        if not is_valid:
+            return False, message
 
         # Create CSV file record
         csv_file = CSVFile(filename=file_storage.filename,
                            user_id=user_id,
-                           total_responses=len(df))
+                           total_responses=0,
+                           status='processing')
         db.session.add(csv_file)
-        db.session.flush()  # Get the ID without committing
-
-        # Process each row
-        for idx, row in df.iterrows():
-            # Check if we have a response_id column
-            if 'response_id' in df.columns:
-                # Use the existing response_id or generate one if cell is empty/null
-                response_id = row['response_id'] if pd.notna(
-                    row['response_id']) else f'auto_gen_{idx}'
-            else:
-                # No response_id column exists, generate one
-                response_id = f'auto_gen_{idx}'
-
-            response = Response(
-                response_id=response_id,
-                prompt_id=row.get('prompt_id'),
-                model_name=row.get('model_name') or row.get('model_id'),
-                model_id=row.get('model_id') or row.get('model_name'),
-                document_id=row.get('document_id'),
-                author=row.get('author'),
-                title=row.get('title'),
-                publication_date=row.get('publication_date'),
-                document_length=row.get('document_length'),
-                keep_fine_tuning=row.get('keep_fine_tuning'),
-
-                # Time/Period fields
-                gt_period=row.get('gt_period'),
-                pred_period=row.get('pred_period'),
-                score_period_string=row.get('score_period_string'),
-                gt_timeframe=row.get('gt_timeframe'),
-                pred_timeframe=row.get('pred_timeframe'),
-                score_period_timeframe=row.get('score_period_timeframe'),
-                gt_period_reason=row.get('gt_period_reason'),
-                gt_period_reasoning=row.get('gt_period_reasoning'),
-                pred_period_reasoning=row.get('pred_period_reasoning'),
-                score_period_reasoning=row.get('score_period_reasoning'),
-
-                # Location fields with new/renamed columns
-                # Handle renamed columns with backward compatibility
-                gt_preferred_location=row.get('gt_preferred_location') or row.get('gt_location'),
-                gt_accepted_locations=row.get('gt_accepted_locations'),
-                gt_preferred_location_QID=row.get('gt_preferred_location_QID') or row.get('gt_location_QID'),
-                gt_acceptable_location_QIDs=row.get('gt_acceptable_location_QIDs'),
-                
-                # Keep old column values for backward compatibility
-                gt_location=row.get('gt_location') or row.get('gt_preferred_location'),
-                gt_location_QID=row.get('gt_location_QID') or row.get('gt_preferred_location_QID'),
-                
-                # Unchanged fields
-                pred_location=row.get('pred_location'),
-                score_location_string=row.get('score_location_string'),
-                pred_location_qid=row.get('pred_location_qid'),
-                score_location_qid=row.get('score_location_qid'),
-                gt_location_reason=row.get('gt_location_reason'),
-                pred_location_reasoning=row.get('pred_location_reasoning'),
-                score_location_reasoning=row.get('score_location_reasoning'),
-                csv_file_id=csv_file.id)
-            db.session.add(response)
-
         db.session.commit()
-        return True, f"Successfully processed {len(df)} responses"
+        csv_file_id = csv_file.id
+
+        if file_type in COLUMNAR_TYPES:
+            ingested, rate = _ingest_columnar(csv_file, file_storage.stream,
+                                              file_type)
+        else:
+            ingested, rate = _ingest_text_stream(csv_file, text_stream,
+                                                 headers, delimiter)
+        return True, f"Successfully processed {ingested} responses ({rate:.0f} rows/sec)"
 
     except SQLAlchemyError as e:
         db.session.rollback()
         current_app.logger.error(f"Database error: {str(e)}")
+        if csv_file_id:
+            _discard_partial_upload(csv_file_id)
         return False, f"Database error: {str(e)}"
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error processing file: {str(e)}")
+        if csv_file_id:
+            _discard_partial_upload(csv_file_id)
         return False, f"Error processing file: {str(e)}"
+    finally:
+        if text_stream is not None:
+            text_stream.detach()
+
+
+def response_positions(csv_file, response_ids):
+    """
+    Map response ids of a file to their 1-based positions within it, read
+    from the positions stored at ingest time
+    """
+    return dict(db.session.execute(
+        select(Response.id, Response.position)
+        .where(Response.csv_file_id == csv_file.id,
+               Response.id.in_(response_ids))).all())
+
+
+def backfill_positions():
+    """
+    Number the responses of every file in id order, for rows stored before
+    positions were assigned at ingest time, with one windowed UPDATE.
+    Returns the number of rows.
+    """
+    table = Response.__table__
+    numbered = select(
+        table.c.id,
+        func.row_number().over(partition_by=table.c.csv_file_id,
+                               order_by=table.c.id).label('position')
+    ).subquery()
+    result = db.session.execute(
+        update(table).where(table.c.id == numbered.c.id)
+        .values(position=numbered.c.position))
+    db.session.commit()
+    return result.rowcount
+
+
+def get_response_navigation(csv_file, response_id, conditions=()):
+    """
+    Find the previous and next response ids, among those meeting the
+    optional extra Response conditions, and the 1-based position of a
+    response within its file, using keyset lookups on Response.id instead of
+    loading the whole file
+    """
+    in_file = Response.csv_file_id == csv_file.id
+    prev_id = db.session.scalar(
+        select(func.max(Response.id)).where(in_file, Response.id < response_id,
+                                            *conditions))
+    next_id = db.session.scalar(
+        select(func.min(Response.id)).where(in_file, Response.id > response_id,
+                                            *conditions))
+    position = response_positions(csv_file, [response_id])[response_id]
+    return prev_id, next_id, position
+
+
+# Fields of an assessment item sent to the browser, each taken from the first
+# non-empty of its columns (the fallbacks assessment.html uses)
+ASSESSMENT_ITEM_FIELDS = {
+    'model': ('model_name', 'model_id'),
+    'prompt_id': ('prompt_id',),
+    'author': ('author',),
+    'title': ('title',),
+    'publication_date': ('publication_date',),
+    'gt_period': ('gt_period',),
+    'pred_period': ('pred_period',),
+    'gt_timeframe': ('gt_timeframe',),
+    'pred_timeframe': ('pred_timeframe',),
+    'gt_period_reasoning': ('gt_period_reason', 'gt_period_reasoning'),
+    'pred_period_reasoning': ('pred_period_reasoning',),
+    'gt_location': ('gt_preferred_location', 'gt_location'),
+    'gt_accepted_locations': ('gt_accepted_locations',),
+    'gt_location_qid': ('gt_preferred_location_QID', 'gt_location_QID'),
+    'gt_acceptable_location_qids': ('gt_acceptable_location_QIDs',),
+    'pred_location': ('pred_location',),
+    'pred_location_qid': ('pred_location_qid',),
+    'gt_location_reasoning': ('gt_location_reason',),
+    'pred_location_reasoning': ('pred_location_reasoning',),
+}
+
+
+def get_assessment_items(user_id, csv_file, after_id, limit, conditions=()):
+    """
+    Return the next responses of a file the user has not assessed, after a
+    response id and meeting the optional extra Response conditions, as
+    compact dicts for the assessment page to show without a reload. Only the
+    displayed columns are selected.
+    """
+    columns = list(dict.fromkeys(
+        column for names in ASSESSMENT_ITEM_FIELDS.values() for column in names))
+    columns += SUGGESTION_COLUMNS.values()
+    query = select(Response.id, *[getattr(Response, name) for name in columns])\
+        .outerjoin(Assessment, and_(Assessment.response_id == Response.id,
+                                    Assessment.user_id == user_id))\
+        .where(Response.csv_file_id == csv_file.id, Response.id > after_id,
+               Assessment.id.is_(None), *conditions)\
+        .order_by(Response.id)\
+        .limit(limit)
+    rows = db.session.execute(query).all()
+    positions = response_positions(csv_file, [row.id for row in rows])
+
+    items = []
+    for row in rows:
+        item = {'id': row.id, 'position': positions[row.id]}
+        for field, names in ASSESSMENT_ITEM_FIELDS.items():
+            item[field] = next((getattr(row, name) for name in names
+                                if getattr(row, name)), None)
+        item['suggested'] = {name: getattr(row, column)
+                             for name, column in SUGGESTION_COLUMNS.items()}
+        items.append(item)
+    return items
+
+
+# Used until config.json has been loaded successfully
+DEFAULT_ASSESSMENT_CRITERIA = {
+    "period_string": "Assess accuracy of predicted time period string (0-1)",
+    "period_interval": "Assess accuracy of predicted time interval (0-1)",
+    "location_string": "Assess accuracy of predicted location string (0-1)",
+    "location_qid": "Assess accuracy of predicted location QID (0-1)"
+}
+
+
+class CriteriaRegistry:
+    """
+    Assessment criteria loaded from a JSON config file, reloaded only when
+    the file's modification time changes. The version is a short hash of the
+    file contents, usable as a cache key.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.criteria = dict(DEFAULT_ASSESSMENT_CRITERIA)
+        self.version = 'default'
+        self._mtime = -1
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Reload the config file if it changed; keep the last good criteria
+        if it cannot be read
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
+            try:
+                with open(self.path, 'rb') as f:
+                    raw = f.read()
+                self.criteria = json.loads(raw).get('assessment_criteria', {})
+                self.version = hashlib.sha1(raw).hexdigest()[:12]
+                app.logger.info(
+                    f"Loaded assessment criteria version {self.version}")
+            except Exception as e:
+                app.logger.error(
+                    f"Error loading assessment criteria: {str(e)}")
+
+    def get(self):
+        self.refresh()
+        return self.criteria
+
+
+criteria_registry = CriteriaRegistry(os.path.join(app.root_path, 'config.json'))
+criteria_registry.refresh()
 
 
 def get_assessment_criteria():
     """
-    Load assessment criteria from config file
+    Return the assessment criteria from config.json
+    """
+    return criteria_registry.get()
+
+
+def get_criteria_version():
+    """
+    Return the version hash of the loaded assessment criteria
+    """
+    criteria_registry.refresh()
+    return criteria_registry.version
+
+
+# Score values accepted for each criterion, as in AssessmentForm
+ASSESSMENT_SCORE_VALUES = (0.0, 0.5, 1.0)
+
+
+def score_choice(value):
+    """
+    Format a stored score as the value of its AssessmentForm choice
+    """
+    return None if value is None else f'{value:g}'
+
+
+def accept_suggested_scores(csv_file, user_id):
+    """
+    Save the suggested scores as the user's assessments for every response
+    of a file they have not assessed yet and that has a suggestion for all
+    four criteria, with one INSERT ... SELECT. Returns (success, message).
     """
+    columns = [getattr(Response, column) for column in SUGGESTION_COLUMNS.values()]
+    unassessed = ~exists().where(Assessment.response_id == Response.id,
+                                 Assessment.user_id == user_id)
+    now = datetime.utcnow()
+    suggested = select(Response.id, literal(user_id), *columns,
+                       literal(now), literal(now))\
+        .where(Response.csv_file_id == csv_file.id, unassessed,
+               *[column.isnot(None) for column in columns])
     try:
-        with open('config.json', 'r') as f:
-            config = json.load(f)
-            return config.get('assessment_criteria', {})
-    except Exception as e:
-        current_app.logger.error(
-            f"Error loading assessment criteria: {str(e)}")
-        return {
-            "time": "Assess accuracy of predicted time period (0-1)",
-            "space": "Assess accuracy of predicted location (0-1)"
-        }
-
-
-def search_responses(query, user_id):
-    """
-    Search responses by author, title, or text
-    """
-    search_term = f"%{query}%"
-    return Response.query.join(CSVFile).filter(
-        CSVFile.user_id == user_id,
-        (Response.author.ilike(search_term) | Response.title.ilike(search_term)
-         | Response.response_id.ilike(search_term)
-         | Response.document_id.ilike(search_term)
-         | Response.model_name.ilike(search_term)
-         | Response.model_id.ilike(search_term)
-         | Response.prompt_id.ilike(search_term)
-         | Response.gt_period.ilike(search_term)
-         | Response.pred_period.ilike(search_term)
-         | Response.gt_timeframe.ilike(search_term)
-         | Response.pred_timeframe.ilike(search_term)
-         | Response.gt_preferred_location.ilike(search_term)
-         | Response.gt_accepted_locations.ilike(search_term)
-         | Response.gt_preferred_location_QID.ilike(search_term)
-         | Response.gt_acceptable_location_QIDs.ilike(search_term)
-         | Response.gt_location.ilike(search_term)
-         | Response.pred_location.ilike(search_term))).all()
+        result = db.session.execute(
+            insert(Assessment).from_select(
+                ['response_id', 'user_id']
+                + [f'score_{name}' for name in SUGGESTION_COLUMNS]
+                + ['created_at', 'updated_at'],
+                suggested))
+        rebuild_score_summary(csv_file.id)
+        db.session.commit()
+    except IntegrityError:
+        # Some of these responses were assessed concurrently
+        db.session.rollback()
+        return False, 'Some responses were assessed meanwhile, please try again'
 
+    # Recompute the file's running totals and work cursors
+    rebuild_progress(csv_file.id)
+    return True, f'Accepted the suggested scores of {result.rowcount} responses'
 
-def calculate_average_scores(user_id, csv_file_id):
+
+def _parse_assessment_item(item):
     """
-    Calculate separate average scores for time period (string), time period (interval),
-    location (string), and location (QID)
+    Validate one record of an assessment batch, returning (response_id,
+    scores) with scores keyed by SCORE_FIELDS. Raises ValueError.
     """
-    assessments = Assessment.query.join(Response).join(CSVFile).filter(
-        CSVFile.id == csv_file_id, Assessment.user_id == user_id).all()
-
-    if not assessments:
-        return {
-            "period_string": 0, 
-            "period_timeframe": 0, 
-            "location_string": 0, 
-            "location_qid": 0, 
-            "count": 0
-        }
-
-    # Collect each type of score separately
-    period_string_scores = [
-        a.score_period_string for a in assessments
-        if a.score_period_string is not None
-    ]
-    
-    period_timeframe_scores = [
-        a.score_period_timeframe for a in assessments
-        if a.score_period_timeframe is not None
-    ]
-    
-    location_string_scores = [
-        a.score_location_string for a in assessments
-        if a.score_location_string is not None
-    ]
-    
-    location_qid_scores = [
-        a.score_location_qid for a in assessments
-        if a.score_location_qid is not None
-    ]
+    if not isinstance(item, dict):
+        raise ValueError('Assessment must be an object')
+    response_id = item.get('response_id')
+    if not isinstance(response_id, int) or isinstance(response_id, bool):
+        raise ValueError('response_id must be an integer')
+
+    scores = {}
+    for name in SCORE_FIELDS:
+        try:
+            value = float(item[f'score_{name}'])
+        except KeyError:
+            raise ValueError(f'score_{name} is required')
+        except (TypeError, ValueError):
+            raise ValueError(f'score_{name} must be a number')
+        if value not in ASSESSMENT_SCORE_VALUES:
+            raise ValueError(f'score_{name} must be one of '
+                             f"{', '.join(f'{v:g}' for v in ASSESSMENT_SCORE_VALUES)}")
+        scores[name] = value
+    return response_id, scores
+
+
+def save_assessment_batch(csv_file, user_id, items):
+    """
+    Create or update the user's assessments of responses in a file from a
+    list of {response_id, score_*} records, in one transaction.
+    Returns (success, message, results) with one result per record.
+    """
+    progress = get_progress(user_id, csv_file.id)
 
-    # Calculate averages for each type
-    avg_period_string = sum(period_string_scores) / len(period_string_scores) if period_string_scores else 0
-    avg_period_timeframe = sum(period_timeframe_scores) / len(period_timeframe_scores) if period_timeframe_scores else 0
-    avg_location_string = sum(location_string_scores) / len(location_string_scores) if location_string_scores else 0
-    avg_location_qid = sum(location_qid_scores) / len(location_qid_scores) if location_qid_scores else 0
+    results, parsed = [], []
+    for item in items:
+        try:
+            parsed.append(_parse_assessment_item(item))
+            results.append(None)
+        except ValueError as e:
+            parsed.append(None)
+            results.append({
+                'response_id': item.get('response_id') if isinstance(item, dict) else None,
+                'status': 'error',
+                'error': str(e)
+            })
+
+    response_ids = {entry[0] for entry in parsed if entry}
+    in_file = set(db.session.scalars(
+        select(Response.id).where(Response.csv_file_id == csv_file.id,
+                                  Response.id.in_(response_ids))))
+    assessments = {
+        assessment.response_id: assessment
+        for assessment in Assessment.query.filter(
+            Assessment.user_id == user_id,
+            Assessment.response_id.in_(in_file))
+    }
+
+    changes, changed_ids, created = [], [], []
+    for index, entry in enumerate(parsed):
+        if entry is None:
+            continue
+        response_id, scores = entry
+        if response_id not in in_file:
+            results[index] = {'response_id': response_id, 'status': 'error',
+                              'error': 'Response not found in this file'}
+            continue
+
+        assessment = assessments.get(response_id)
+        if assessment:
+            changes.append(({name: getattr(assessment, f'score_{name}')
+                             for name in SCORE_FIELDS}, scores))
+            assessment.updated_at = datetime.utcnow()
+            status = 'updated'
+        else:
+            assessment = Assessment(response_id=response_id, user_id=user_id)
+            db.session.add(assessment)
+            assessments[response_id] = assessment
+            changes.append((None, scores))
+            created.append(response_id)
+            status = 'created'
+        changed_ids.append(response_id)
+        for name, value in scores.items():
+            setattr(assessment, f'score_{name}', value)
+        results[index] = {'response_id': response_id, 'status': status}
+
+    # Both the autoflush before the summary key lookup and record_assessed
+    # insert the new assessments, so a duplicate can fail there already
+    try:
+        if changes:
+            record_score_changes(progress, changes)
+            keys = response_summary_keys(changed_ids)
+            record_summary_changes(csv_file.id, [
+                (keys[response_id], old_scores, new_scores)
+                for response_id, (old_scores, new_scores) in zip(changed_ids, changes)])
+        if created:
+            csv_file.assessed_responses = CSVFile.assessed_responses + len(created)
+            for response_id in sorted(created):
+                record_assessed(progress, response_id)
+
+        db.session.commit()
+    except IntegrityError:
+        # Another request saved one of these assessments concurrently
+        db.session.rollback()
+        return False, 'Assessments were saved concurrently, retry the batch', None
+
+    return True, f'Saved {len(changes)} assessments', results
 
+
+# Fields returned by the response list endpoint unless others are requested
+RESPONSE_LIST_FIELDS = ['id', 'author', 'title']
+
+
+def response_list_fields(requested):
+    """
+    Resolve a comma-separated fields= parameter against the Response columns.
+    Returns (fields, unknown fields); the id is always included.
+    """
+    if not requested:
+        return list(RESPONSE_LIST_FIELDS), []
+    columns = Response.__table__.columns.keys()
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in columns]
+    fields = ['id'] + [name for name in dict.fromkeys(names) if name != 'id']
+    return fields, unknown
+
+
+def next_response_cursor(csv_file_id, after_id, limit):
+    """
+    Return the after_id of the page following a response list page, or None
+    if that page is the last one (index-only lookups on csv_file_id, id)
+    """
+    in_page = and_(Response.csv_file_id == csv_file_id, Response.id > after_id)
+    last_id = db.session.scalar(
+        select(Response.id).where(in_page).order_by(Response.id)
+        .offset(limit - 1).limit(1))
+    if last_id is None:
+        return None
+    more = db.session.scalar(
+        select(Response.id).where(Response.csv_file_id == csv_file_id,
+                                  Response.id > last_id).limit(1))
+    return last_id if more is not None else None
+
+
+def iter_responses_json(csv_file_id, fields, after_id, limit):
+    """
+    Generate a JSON array of the projected fields of a page of responses,
+    keyset-paginated on the id and streamed in fetched batches
+    """
+    query = select(*[getattr(Response, name) for name in fields])\
+        .where(Response.csv_file_id == csv_file_id, Response.id > after_id)\
+        .order_by(Response.id)\
+        .limit(limit)\
+        .execution_options(yield_per=current_app.config['EXPORT_BATCH_SIZE'])
+
+    separator = '['
+    for rows in db.session.execute(query).partitions():
+        yield separator + ','.join(
+            json.dumps(dict(zip(fields, row))) for row in rows)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+def search_responses(query, user_id, page=1, per_page=None):
+    """
+    Search responses by author, title, ids, period or location through the
+    full-text index; a QID query ("Q90") finds the responses whose reference
+    or acceptable QIDs include it. Returns (responses on the page ranked by
+    relevance, whether further pages exist).
+    """
+    per_page = per_page or current_app.config['SEARCH_PAGE_SIZE']
+    find_ids = qid_response_ids if is_qid(query) else search_response_ids
+    ids = find_ids(query, user_id, per_page + 1, (page - 1) * per_page)
+    has_more = len(ids) > per_page
+    ids = ids[:per_page]
+
+    responses = {r.id: r for r in Response.query.filter(Response.id.in_(ids))}
+    return [responses[i] for i in ids if i in responses], has_more
+
+
+def _score_summary(period_string, period_timeframe, location_string,
+                   location_qid, count):
+    """
+    Format average scores the way the dashboard and assessment views expect
+    """
+    def average(value):
+        return round(value, 2) if value is not None else 0
+
+    period_string = average(period_string)
+    location_string = average(location_string)
     return {
-        "period_string": round(avg_period_string, 2),
-        "period_timeframe": round(avg_period_timeframe, 2),
-        "location_string": round(avg_location_string, 2),
-        "location_qid": round(avg_location_qid, 2),
+        "period_string": period_string,
+        "period_timeframe": average(period_timeframe),
+        "location_string": location_string,
+        "location_qid": average(location_qid),
         # Keep these for backward compatibility
-        "time": round(avg_period_string, 2),
-        "space": round(avg_location_string, 2),
-        "count": len(assessments)
+        "time": period_string,
+        "space": location_string,
+        "count": count
     }
 
 
-def export_results_to_csv(user_id, csv_file_id):
+def calculate_file_scores(user_id, csv_file_ids=None):
     """
-    Export assessment results to CSV or TSV based on original file format
+    Calculate average scores for all of a user's files (or the given ones)
+    from the running totals kept in AssessmentProgress, in a single query.
+    Returns {csv_file_id: scores}.
     """
+    query = AssessmentProgress.query.filter_by(user_id=user_id)
+    if csv_file_ids is not None:
+        query = query.filter(AssessmentProgress.csv_file_id.in_(csv_file_ids))
+
+    stats = {}
+    for progress in query:
+        stats[progress.csv_file_id] = progress_summary(progress)
+
+    if csv_file_ids is not None:
+        for csv_file_id in csv_file_ids:
+            stats.setdefault(csv_file_id, _score_summary(0, 0, 0, 0, 0))
+    return stats
+
+
+def get_statistics(user_id, csv_file_id=None):
+    """
+    Overall progress and average scores of a user across their files (or one
+    file), from the running totals kept in AssessmentProgress and the file
+    row counts, in two aggregate queries
+    """
+    files = select(func.coalesce(func.sum(CSVFile.total_responses), 0))\
+        .where(CSVFile.user_id == user_id, CSVFile.status == 'ready')
+    progress = select(
+        func.coalesce(func.sum(AssessmentProgress.assessed_count), 0),
+        *[func.sum(getattr(AssessmentProgress, f'{name}_{part}'))
+          for name in SCORE_FIELDS for part in ('sum', 'count')])\
+        .join(CSVFile, CSVFile.id == AssessmentProgress.csv_file_id)\
+        .where(AssessmentProgress.user_id == user_id,
+               CSVFile.status == 'ready')
+    if csv_file_id is not None:
+        files = files.where(CSVFile.id == csv_file_id)
+        progress = progress.where(CSVFile.id == csv_file_id)
+
+    total = db.session.scalar(files)
+    assessed, *totals = db.session.execute(progress).one()
+    averages = [total_sum / count if count else None
+                for total_sum, count in zip(totals[::2], totals[1::2])]
+    return {
+        'progress': {
+            'assessed': assessed,
+            'total': total,
+            'percentage': round(assessed / total * 100, 2) if total else 0
+        },
+        'avg_scores': _score_summary(*averages, assessed)
+    }
+
+
+def progress_summary(progress):
+    """
+    Format the average scores of a progress record
+    """
+    averages, count = progress_scores(progress)
+    return _score_summary(averages['period_string'],
+                          averages['period_timeframe'],
+                          averages['location_string'],
+                          averages['location_qid'],
+                          count)
+
+
+def calculate_average_scores(user_id, csv_file_id):
+    """
+    Calculate separate average scores for time period (string), time period (interval),
+    location (string), and location (QID)
+    """
+    return calculate_file_scores(user_id, [csv_file_id])[csv_file_id]
+
+
+# Response fields included in exports, in column order
+EXPORT_RESPONSE_COLUMNS = [
+    # Basic response info
+    'response_id',
+    'prompt_id',
+    'model_name',
+    'model_id',
+    'document_id',
+    'author',
+    'title',
+    'publication_date',
+    'document_length',
+    'keep_fine_tuning',
+
+    # Period/time info
+    'gt_period',
+    'pred_period',
+    'score_period_string',
+    'gt_timeframe',
+    'pred_timeframe',
+    'score_period_timeframe',
+
+    # Location info with new fields
+    'gt_preferred_location',
+    'gt_accepted_locations',
+    'pred_location',
+    'score_location_string',
+    'gt_preferred_location_QID',
+    'gt_acceptable_location_QIDs',
+    'pred_location_qid',
+    'score_location_qid',
+
+    # Include old field names for backward compatibility
+    'gt_location',
+    'gt_location_QID'
+]
+
+# Manual assessment scores, exported under their own names
+EXPORT_SCORE_COLUMNS = [
+    ('period_string_score', 'score_period_string'),
+    ('period_timeframe_score', 'score_period_timeframe'),
+    ('location_string_score', 'score_location_string'),
+    ('location_qid_score', 'score_location_qid')
+]
+
+EXPORT_HEADERS = (EXPORT_RESPONSE_COLUMNS
+                  + [name for name, _ in EXPORT_SCORE_COLUMNS]
+                  + ['assessment_date'])
+
+
+def _export_rows(user_id, csv_file_id):
+    """
+    Stream response rows joined with the user's assessment scores in a
+    single query, fetched in batches of EXPORT_BATCH_SIZE rows
+    """
+    query = select(
+        *[getattr(Response, name) for name in EXPORT_RESPONSE_COLUMNS],
+        *[getattr(Assessment, column) for _, column in EXPORT_SCORE_COLUMNS],
+        Assessment.updated_at
+    ).join(CSVFile, Response.csv_file_id == CSVFile.id)\
+        .outerjoin(Assessment, and_(Assessment.response_id == Response.id,
+                                    Assessment.user_id == user_id))\
+        .where(CSVFile.id == csv_file_id, CSVFile.user_id == user_id)\
+        .order_by(Response.id)\
+        .execution_options(yield_per=current_app.config['EXPORT_BATCH_SIZE'])
+    return db.session.execute(query).partitions()
+
+
+def iter_export_tsv(user_id, csv_file_id):
+    """
+    Generate assessment results as TSV text, one chunk per fetched batch,
+    so the export can be streamed without building it in memory
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter='\t', lineterminator='\n')
+    writer.writerow(EXPORT_HEADERS)
+    try:
+        for rows in _export_rows(user_id, csv_file_id):
+            for row in rows:
+                *values, updated_at = row
+                values.append(updated_at.strftime('%Y-%m-%d %H:%M:%S')
+                              if updated_at else None)
+                writer.writerow(values)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    except Exception as e:
+        current_app.logger.error(f"Error exporting results: {str(e)}")
+        raise
+
+
+# Export formats: label, MIME type and file extension
+EXPORT_FORMATS = {
+    'tsv': ('TSV', 'text/tab-separated-values', 'tsv'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('Arrow', 'application/vnd.apache.arrow.file', 'arrow'),
+}
+
+
+def _score_value(value):
+    """
+    An uploaded score as a float, or None when the cell is empty or not a
+    number
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_export_columnar(user_id, csv_file_id, file_type):
+    """
+    Generate assessment results as a Parquet or Arrow file, one row group or
+    record batch per fetched batch, keeping the column types (integer
+    document_length, boolean keep_fine_tuning, float scores, timestamp)
+    """
+    # The scores uploaded with the responses are stored as text; they are
+    # written as floats like the annotators' scores
+    uploaded_scores = {column for _, column in EXPORT_SCORE_COLUMNS}
+    columns = ([(name, db.Float() if name in uploaded_scores
+                 else Response.__table__.c[name].type)
+                for name in EXPORT_RESPONSE_COLUMNS]
+               + [(name, Assessment.__table__.c[column].type)
+                  for name, column in EXPORT_SCORE_COLUMNS]
+               + [('assessment_date', Assessment.__table__.c.updated_at.type)])
+    score_indexes = [index for index, name in enumerate(EXPORT_RESPONSE_COLUMNS)
+                     if name in uploaded_scores]
+
+    def typed_rows():
+        for rows in _export_rows(user_id, csv_file_id):
+            rows = [list(row) for row in rows]
+            for row in rows:
+                for index in score_indexes:
+                    row[index] = _score_value(row[index])
+            yield rows
+
     try:
-        # Get all responses with assessments
-        responses = Response.query.join(CSVFile).filter(
-            CSVFile.id == csv_file_id, CSVFile.user_id == user_id).all()
-
-        # Prepare data for export
-        export_data = []
-        for response in responses:
-            row = {
-                # Basic response info
-                "response_id":
-                response.response_id,
-                "prompt_id":
-                response.prompt_id,
-                "model_name":
-                response.model_name,
-                "model_id":
-                response.model_id,
-                "document_id":
-                response.document_id,
-                "author":
-                response.author,
-                "title":
-                response.title,
-                "publication_date":
-                response.publication_date,
-
-                # Period/time info
-                "gt_period":
-                response.gt_period,
-                "pred_period":
-                response.pred_period,
-                "score_period_string":
-                response.score_period_string,
-                "gt_timeframe":
-                response.gt_timeframe,
-                "pred_timeframe":
-                response.pred_timeframe,
-                "score_period_timeframe":
-                response.score_period_timeframe,
-
-                # Location info with new fields
-                "gt_preferred_location":
-                response.gt_preferred_location,
-                "gt_accepted_locations":
-                response.gt_accepted_locations,
-                "pred_location":
-                response.pred_location,
-                "score_location_string":
-                response.score_location_string,
-                "gt_preferred_location_QID":
-                response.gt_preferred_location_QID,
-                "gt_acceptable_location_QIDs":
-                response.gt_acceptable_location_QIDs,
-                "pred_location_qid":
-                response.pred_location_qid,
-                "score_location_qid":
-                response.score_location_qid,
-                
-                # Include old field names for backward compatibility
-                "gt_location":
-                response.gt_location,
-                "gt_location_QID":
-                response.gt_location_QID,
-
-                # Manual assessment scores
-                "period_string_score":
-                response.assessment.score_period_string
-                if response.assessment else None,
-                "period_timeframe_score":
-                response.assessment.score_period_timeframe
-                if response.assessment else None,
-                "location_string_score":
-                response.assessment.score_location_string
-                if response.assessment else None,
-                "location_qid_score":
-                response.assessment.score_location_qid
-                if response.assessment else None,
-                "assessment_date":
-                response.assessment.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-                if response.assessment else None
-            }
-            export_data.append(row)
-
-        # Always use TSV format with tab separator
-        delimiter = '\t'
-
-        # Convert to DataFrame and export
-        df = pd.DataFrame(export_data)
-        output = StringIO()
-        df.to_csv(output, index=False, sep=delimiter)
-
-        return output.getvalue()
+        yield from iter_columnar_export(columns, typed_rows(), file_type)
+    except Exception as e:
+        current_app.logger.error(f"Error exporting results: {str(e)}")
+        raise
+
+
+def iter_export(user_id, csv_file_id, export_format='tsv'):
+    """
+    Generate assessment results in one of EXPORT_FORMATS, as text (TSV) or
+    bytes chunks to stream
+    """
+    file_type = EXPORT_FORMATS[export_format][0]
+    if file_type in COLUMNAR_TYPES:
+        return iter_export_columnar(user_id, csv_file_id, file_type)
+    return iter_export_tsv(user_id, csv_file_id)
 
+
+def export_results_to_csv(user_id, csv_file_id):
+    """
+    Export assessment results to a TSV string
+    """
+    try:
+        return ''.join(iter_export_tsv(user_id, csv_file_id))
     except Exception as e:
         current_app.logger.error(f"Error exporting results: {str(e)}")
-        import traceback
-        current_app.logger.error(traceback.format_exc())
         return None